@@ -1,54 +1,131 @@
-
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, Flask, current_app, get_template_attribute, render_template, request, redirect, url_for, session, flash, abort, Response, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from models import db, User, Flashcard, Subject, Purchase, Classroom, ClassMembership
-import random
+from sqlalchemy.orm import joinedload
+from models import db, User, Flashcard, Subject, Classroom
+import card_import
+import card_selection
+import dashboard
+import db_pool
+import deck_export
+import deletion
+import enrollment
+import entitlements
+import fragment_cache
+import keyset
+import progress
+import review_log
+import schema
+import search
+import server_sessions
+import sql_stats
+import scheduler
+import study_queue
+import io
 import os
-from google.cloud.sql.connector import Connector, IPTypes
-import pg8000
+import click
+import gzip
+import json
+
+bp = Blueprint("main", __name__, cli_group=None)
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
 
-app = Flask(__name__)
-app.secret_key = os.environ.get("SECRET_KEY", "supersecretkey")  # Needed for session handling
 
-# Database configuration
-db_user = os.environ.get("DB_USER")
-db_pass = os.environ.get("DB_PASS")
-db_name = os.environ.get("DB_NAME")
-instance_connection_name = os.environ.get("INSTANCE_CONNECTION_NAME")
+def cloud_sql_engine_options(instance_connection_name):
+    """Engine options that connect through the Cloud SQL connector.
 
-if instance_connection_name:
-    # Use Cloud SQL if connection name is provided
-    # Initialize Connector object
-    connector = Connector()
+    The connector (and with it pg8000 and the Google auth stack) is imported
+    and started on the first connection rather than here, and again in each
+    forked worker, since its background thread does not survive a fork.
+    SQLite setups, CLI commands and worker spawns never pay for it.
+    """
+    connectors = {}
 
     def getconn():
+        from google.cloud.sql.connector import Connector, IPTypes
+
+        connector = connectors.get(os.getpid())
+        if connector is None:
+            connectors.clear()
+            connector = connectors[os.getpid()] = Connector()
         conn = connector.connect(
             instance_connection_name,
             "pg8000",
-            user=db_user,
-            password=db_pass,
-            db=db_name,
+            user=os.environ.get("DB_USER"),
+            password=os.environ.get("DB_PASS"),
+            db=os.environ.get("DB_NAME"),
             ip_type=IPTypes.PUBLIC,  # Can be changed to PRIVATE if needed
         )
         return conn
 
-    app.config['SQLALCHEMY_DATABASE_URI'] = "postgresql+pg8000://"
-    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        "creator": getconn
-    }
-else:
-    # Fallback to SQLite
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///flashcards.db'
+    return {"creator": getconn, **db_pool.engine_options(os.environ)}
 
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-# Initialize database
-db.init_app(app)
+def warm_up_pool(app):
+    """Open DB_POOL_WARMUP connections for this process.
 
-# Initialize Flask-Login
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+    Call after forking (see gunicorn.conf.py); connections opened before the
+    fork would be shared by every worker. Pooled connections inherited from
+    the parent are dropped without closing the parent's sockets.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+        return db_pool.warm_up(db.engine, db_pool.warmup_size(os.environ))
+
+
+def precompile_templates(app):
+    """Compile every template into the Jinja cache.
+
+    Done at startup so that workers forked from a preloaded app (e.g.
+    gunicorn --preload) share the compiled templates instead of each
+    compiling them on its first requests.
+    """
+    names = app.jinja_env.list_templates(extensions=["html"])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def create_app(config=None):
+    """Create and configure the application.
+
+    `config` is applied over the settings read from the environment, e.g.
+    {"SQLALCHEMY_DATABASE_URI": ...} for benchmarks.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SECRET_KEY", "supersecretkey")  # Needed for session handling
+
+    # Database configuration
+    instance_connection_name = os.environ.get("INSTANCE_CONNECTION_NAME")
+    if instance_connection_name:
+        # Use Cloud SQL if connection name is provided
+        app.config['SQLALCHEMY_DATABASE_URI'] = "postgresql+pg8000://"
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = cloud_sql_engine_options(instance_connection_name)
+    else:
+        # Fallback to SQLite (DATABASE_URL can point it elsewhere)
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL", 'sqlite:///flashcards.db')
+
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQL_STATS_ENABLED'] = os.environ.get("SQL_STATS", "").lower() in ("1", "true", "yes")
+    app.config['PRECOMPILE_TEMPLATES'] = os.environ.get("PRECOMPILE_TEMPLATES", "1") not in ("0", "false", "no")
+    app.config.update(config or {})
+
+    db.init_app(app)
+    if click.get_current_context(silent=True) is not None:
+        # Only the flask CLI needs the `flask db` commands; importing
+        # alembic would otherwise add to every worker's start-up time
+        schema.init_migrations(app)
+    sql_stats.init_app(app)
+    review_log.init_app(app)
+    server_sessions.init_app(app)
+    fragment_cache.init_app(app)
+    login_manager.init_app(app)
+    app.register_blueprint(bp)
+
+    if app.config['PRECOMPILE_TEMPLATES'] and not app.debug:
+        precompile_templates(app)
+
+    return app
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -56,10 +133,22 @@ def load_user(user_id):
 
 # Flashcards are now stored in the database
 
-@app.route("/register", methods=["GET", "POST"])
+ROLES = ['student', 'teacher', 'admin']
+ADMIN_PAGE_SIZE = 50
+ADMIN_USER_SORTS = {"id": User.id, "username": User.username, "email": User.email}
+ADMIN_SUBJECT_SORTS = {"id": Subject.id, "name": Subject.name}
+STUDY_BATCH_SIZE = 20
+STUDY_BATCH_MAX = 100
+STUDY_GRADES_MAX = 500
+GZIP_MIN_SIZE = 512
+MAX_ID = 2**63 - 1  # largest id the databases store
+MAX_ID_DIGITS = len(str(MAX_ID)) - 1
+FLASHED_EMAILS = 20
+
+@bp.route("/register", methods=["GET", "POST"])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     if request.method == "POST":
         username = request.form.get("username")
@@ -73,7 +162,7 @@ def register():
             flash("All fields are required", "error")
             return render_template("register.html")
         
-        if role not in ['student', 'teacher', 'admin']:
+        if role not in ROLES:
             flash("Invalid role selected", "error")
             return render_template("register.html")
         
@@ -97,14 +186,14 @@ def register():
         db.session.commit()
         
         flash("Registration successful! Please login.", "success")
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     return render_template("register.html")
 
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     if request.method == "POST":
         username = request.form.get("username")
@@ -113,22 +202,25 @@ def login():
         user = User.query.filter_by(username=username).first()
         
         if user and user.check_password(password):
+            if user.password_needs_rehash():
+                user.set_password(password)
+                db.session.commit()
             login_user(user)
             next_page = request.args.get('next')
-            return redirect(next_page) if next_page else redirect(url_for('index'))
+            return redirect(next_page) if next_page else redirect(url_for('main.index'))
         else:
             flash("Invalid username or password", "error")
     
     return render_template("login.html")
 
-@app.route("/logout")
+@bp.route("/logout")
 @login_required
 def logout():
     logout_user()
     flash("You have been logged out", "success")
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route("/create_subject", methods=["GET", "POST"])
+@bp.route("/create_subject", methods=["GET", "POST"])
 @login_required
 def create_subject():
     # Get classrooms if teacher
@@ -163,17 +255,17 @@ def create_subject():
         db.session.commit()
         
         flash("Subject created successfully!", "success")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
         
     return render_template("create_subject.html", classrooms=classrooms)
 
-@app.route("/create_card", methods=["GET", "POST"])
+@bp.route("/create_card", methods=["GET", "POST"])
 @login_required
 def create_card():
     subjects = Subject.query.filter_by(user_id=current_user.id).all()
     if not subjects:
         flash("Please create a subject first!", "error")
-        return redirect(url_for('create_subject'))
+        return redirect(url_for('main.create_subject'))
 
     if request.method == "POST":
         question = request.form.get("question")
@@ -186,44 +278,70 @@ def create_card():
             
         card = Flashcard(question=question, answer=answer, user_id=current_user.id, subject_id=subject_id)
         db.session.add(card)
+        db.session.flush()
+        subject_changed(card.subject_id)
         db.session.commit()
         
         flash("Flashcard created successfully!", "success")
-        return redirect(url_for('create_card'))
+        return redirect(url_for('main.create_card'))
         
     return render_template("create_card.html", subjects=subjects)
 
-@app.route("/", methods=["GET"])
+@bp.route("/subject/<int:subject_id>/import", methods=["GET", "POST"])
+@login_required
+def import_cards(subject_id):
+    subject = Subject.query.get_or_404(subject_id)
+    if not entitlements.can_manage(current_user, subject):
+        flash("Access denied.", "error")
+        return redirect(url_for('main.index'))
+
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("Please choose a file to import.", "error")
+            return render_template("import_cards.html", subject=subject)
+
+        fmt = request.form.get("format") or card_import.guess_format(upload.filename)
+        if fmt not in card_import.FORMATS:
+            flash("Invalid import format.", "error")
+            return render_template("import_cards.html", subject=subject)
+
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", errors="replace", newline="")
+        result = card_import.import_cards(stream, subject.id, subject.user_id, fmt)
+
+        flash(f"Imported {result.imported} cards ({result.rows_per_sec:.0f} rows/sec).", "success")
+        if result.rejected:
+            flash(f"{result.rejected} rows were rejected.", "error")
+        return render_template("import_cards.html", subject=subject, result=result)
+
+    return render_template("import_cards.html", subject=subject)
+
+@bp.route("/", methods=["GET"])
 @login_required
 def index():
-    # Get created subjects
-    created_subjects = Subject.query.filter_by(user_id=current_user.id).all()
-    # Get purchased subjects
-    purchased_purchases = Purchase.query.filter_by(user_id=current_user.id).all()
-    purchased_subjects = [p.subject for p in purchased_purchases]
-    
-    classrooms = []
-    class_subjects = []
-    
-    if current_user.role == 'teacher':
-        classrooms = Classroom.query.filter_by(teacher_id=current_user.id).all()
-    elif current_user.role == 'student':
-        # Get subjects from enrolled classes
-        for classroom in current_user.enrolled_classes:
-            class_subjects.extend(classroom.subjects)
-    
-    return render_template("dashboard.html", 
-                         subjects=created_subjects, 
-                         purchased_subjects=purchased_subjects,
-                         classrooms=classrooms,
-                         class_subjects=class_subjects)
+    return render_template("dashboard.html", **dashboard.load_dashboard(current_user))
 
-@app.route("/create_class", methods=["GET", "POST"])
+@bp.route("/search")
+def search_subjects():
+    query = request.args.get("q", "").strip()
+    hits, next_cursor = search.search_subjects(query, after=request.args.get("after"))
+
+    subject_ids = [subject_id for subject_id, _, _ in hits]
+    subjects = {s.id: s for s in Subject.query.filter(Subject.id.in_(subject_ids))} if subject_ids else {}
+    results = [(subjects[subject_id], matches) for subject_id, _, matches in hits if subject_id in subjects]
+
+    return render_template("search.html",
+                           query=query,
+                           results=results,
+                           card_counts=dashboard.card_counts(subject_ids),
+                           next_cursor=next_cursor)
+
+@bp.route("/create_class", methods=["GET", "POST"])
 @login_required
 def create_class():
     if current_user.role != 'teacher':
         flash("Only teachers can create classes.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
         
     if request.method == "POST":
         name = request.form.get("name")
@@ -236,18 +354,18 @@ def create_class():
         db.session.commit()
         
         flash("Class created successfully!", "success")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
         
     return render_template("create_class.html")
 
-@app.route("/class/<int:class_id>", methods=["GET", "POST"])
+@bp.route("/class/<int:class_id>", methods=["GET", "POST"])
 @login_required
 def view_class(class_id):
     classroom = Classroom.query.get_or_404(class_id)
     
     if classroom.teacher_id != current_user.id:
         flash("Access denied.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
         
     if request.method == "POST":
         email = request.form.get("email")
@@ -255,206 +373,540 @@ def view_class(class_id):
         
         if not student:
             flash("User not found.", "error")
-        elif student in classroom.students:
+        elif entitlements.is_class_member(student.id, classroom.id):
             flash("Student already in class.", "info")
         else:
             classroom.students.append(student)
             db.session.commit()
+            entitlements.invalidate_user(student.id)
             flash(f"Added {student.username} to class.", "success")
             
-    return render_template("view_class.html", classroom=classroom)
-
-@app.route("/class/<int:class_id>/student/<int:student_id>")
+    class_progress, summary = progress.class_overview(classroom.id)
+    return render_template("view_class.html", classroom=classroom,
+                           class_progress=class_progress, summary=summary)
+
+def preview_emails(emails):
+    """Join a list of emails for a flash message, eliding the tail of long lists."""
+    shown = ", ".join(emails[:FLASHED_EMAILS])
+    if len(emails) > FLASHED_EMAILS:
+        shown += f" and {len(emails) - FLASHED_EMAILS} more"
+    return shown
+
+@bp.route("/class/<int:class_id>/roster", methods=["POST"])
+@login_required
+def enroll_roster(class_id):
+    classroom = Classroom.query.get_or_404(class_id)
+    if classroom.teacher_id != current_user.id:
+        flash("Access denied.", "error")
+        return redirect(url_for('main.index'))
+
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        flash("Please choose a roster file.", "error")
+        return redirect(url_for('main.view_class', class_id=class_id))
+
+    stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        result = enrollment.enroll(classroom.id, enrollment.read_roster(stream))
+    except enrollment.InvalidRoster as e:
+        flash(str(e), "error")
+        return redirect(url_for('main.view_class', class_id=class_id))
+
+    flash(f"Enrolled {len(result.enrolled)} students; "
+          f"{len(result.already_enrolled)} were already in the class.", "success")
+    if result.missing:
+        flash(f"No account found for: {preview_emails(result.missing)}", "error")
+    if result.duplicates:
+        flash(f"Listed more than once: {preview_emails(result.duplicates)}", "info")
+    return redirect(url_for('main.view_class', class_id=class_id))
+
+@bp.route("/api/class/<int:class_id>/enroll", methods=["POST"])
+def enroll_api(class_id):
+    """Enroll a list of students: {"emails": [...]}."""
+    if not current_user.is_authenticated:
+        return {"error": "login required"}, 401
+    classroom = Classroom.query.get_or_404(class_id)
+    if classroom.teacher_id != current_user.id:
+        return {"error": "access denied"}, 403
+
+    payload = request.get_json(silent=True)
+    emails = payload.get("emails") if isinstance(payload, dict) else None
+    if not isinstance(emails, list) or not all(isinstance(email, str) for email in emails):
+        return {"error": "expected a list of strings in 'emails'"}, 400
+    try:
+        result = enrollment.enroll(classroom.id, emails)
+    except enrollment.RosterTooLarge as e:
+        return {"error": str(e)}, 413
+    return result.as_dict()
+
+@bp.route("/class/<int:class_id>/student/<int:student_id>")
 @login_required
 def view_student_progress(class_id, student_id):
     classroom = Classroom.query.get_or_404(class_id)
     
     if classroom.teacher_id != current_user.id:
         flash("Access denied.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
         
     student = User.query.get_or_404(student_id)
-    if student not in classroom.students:
+    if not entitlements.is_class_member(student.id, classroom.id):
         flash("Student not in this class.", "error")
-        return redirect(url_for('view_class', class_id=class_id))
+        return redirect(url_for('main.view_class', class_id=class_id))
         
     subjects = Subject.query.filter_by(user_id=student.id).all()
-    return render_template("student_progress.html", student=student, subjects=subjects, classroom=classroom)
+    return render_template("student_progress.html", student=student, classroom=classroom,
+                           studied=progress.student_subjects(student.id),
+                           subject_rows=created_subject_rows(subjects))
+
+def subject_changed(subject_id):
+    """Bump a subject's version and drop its cached card ids and fragments. Call before committing."""
+    Subject.bump_version(subject_id)
+    card_selection.invalidate(subject_id)
+    fragment_cache.invalidate_subject(subject_id)
+
+def subject_cards_fragment(subject):
+    """Return the rendered card table of a subject, cached per version and role."""
+    role = current_user.role
+    cards_html = fragment_cache.lookup("subject_cards", subject, role)
+    if cards_html is None:
+        cards = Flashcard.query.filter_by(subject_id=subject.id).order_by(Flashcard.id).all()
+        macro = get_template_attribute("_fragments.html", "subject_cards")
+        cards_html = fragment_cache.store("subject_cards", subject, role, macro(cards, role == 'admin'))
+    return cards_html
+
+def created_subject_rows(subjects):
+    """Return the rendered rows of a subject list, counting cards only for uncached subjects."""
+    role = current_user.role
+    rows = {subject.id: fragment_cache.lookup("created_subject_row", subject, role) for subject in subjects}
+    missing = [subject for subject in subjects if rows[subject.id] is None]
+    if missing:
+        counts = dashboard.card_counts([subject.id for subject in missing])
+        macro = get_template_attribute("_fragments.html", "created_subject_row")
+        for subject in missing:
+            rows[subject.id] = fragment_cache.store("created_subject_row", subject, role,
+                                                    macro(subject, counts.get(subject.id, 0)))
+    return [rows[subject.id] for subject in subjects]
+
+def next_study_card(subject_id, exclude_card_id=None):
+    """Pick the next card: from the user's due-queue if logged in, else at random."""
+    if current_user.is_authenticated:
+        card = study_queue.next_due_card(current_user.id, subject_id, exclude_card_id)
+        if card:
+            return card
+    return card_selection.pick_random_card(subject_id)
 
-@app.route("/study/<int:subject_id>", methods=["GET", "POST"])
+@bp.route("/study/<int:subject_id>", methods=["GET", "POST"])
 def study(subject_id):
     subject = Subject.query.get_or_404(subject_id)
     
-    # Check access: Owner OR Public OR Purchased OR Class Member
-    has_access = False
-    if subject.is_public:
-        has_access = True
-    elif current_user.is_authenticated:
-        if subject.user_id == current_user.id:
-            has_access = True
-        elif subject.classroom_id:
-            # Check if user is in the classroom
-            classroom = Classroom.query.get(subject.classroom_id)
-            if classroom and (current_user in classroom.students or classroom.teacher_id == current_user.id):
-                has_access = True
-        else:
-            purchase = Purchase.query.filter_by(user_id=current_user.id, subject_id=subject_id).first()
-            if purchase:
-                has_access = True
-    
-    if not has_access:
+    if not entitlements.can_study(current_user, subject):
         return render_template("study.html", 
                              subject=subject,
                              question="No flashcards found", 
                              answer="This subject has no cards yet.",
                              no_cards=True)
 
-    cards = subject.flashcards
-    if not cards:
+    if not card_selection.has_cards(subject_id):
         return render_template("study.html", 
                              subject=subject,
                              question="No flashcards found", 
                              answer="This subject has no cards yet.",
                              no_cards=True)
 
-    if "current_card_id" not in session or "subject_id" not in session or session["subject_id"] != subject_id:
-        card = random.choice(cards)
-        session["current_card_id"] = card.id
+    current_card = None
+    if session.get("subject_id") == subject_id:
+        current_card = card_selection.get_card(subject_id, session.get("current_card_id"))
+
+    # Start a new card if the subject changed or the card has been deleted
+    if not current_card:
+        current_card = next_study_card(subject_id)
+        if not current_card:
+            return render_template("study.html", 
+                                 subject=subject,
+                                 question="No flashcards found", 
+                                 answer="This subject has no cards yet.",
+                                 no_cards=True)
+        session["current_card_id"] = current_card.id
         session["subject_id"] = subject_id
         session["show_answer"] = False
-    
-    current_card = Flashcard.query.get(session["current_card_id"])
-    # Handle case where card might have been deleted
-    if not current_card or current_card.subject_id != subject_id:
-        card = random.choice(cards)
-        session["current_card_id"] = card.id
-        current_card = card
-        session["show_answer"] = False
 
     if request.method == "POST":
-        if "next" in request.form:
-            card = random.choice(cards)
-            session["current_card_id"] = card.id
-            current_card = card
+        user_id = current_user.id if current_user.is_authenticated else None
+        grade = request.form.get("grade")
+        if grade in scheduler.GRADES and user_id:
+            study_queue.record_grade(user_id, current_card, grade)
+            review_log.record(user_id, subject_id, current_card.id, "grade", grade)
+        if grade or "next" in request.form:
+            if not grade:
+                review_log.record(user_id, subject_id, current_card.id, "next")
+            current_card = next_study_card(subject_id, exclude_card_id=current_card.id) or current_card
+            session["current_card_id"] = current_card.id
             session["show_answer"] = False
         elif "show" in request.form:
+            review_log.record(user_id, subject_id, current_card.id, "show")
             session["show_answer"] = True
 
     return render_template("study.html",
                            subject=subject,
                            question=current_card.question,
-                           answer=current_card.answer if session["show_answer"] else None)
+                           answer=current_card.answer if session["show_answer"] else None,
+                           grades=scheduler.GRADES)
+
+def compact_json(payload):
+    """Serialize without whitespace and gzip the body when the client accepts it."""
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    response = Response(body, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    if len(body) >= GZIP_MIN_SIZE and "gzip" in request.accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+@bp.route("/api/study/<int:subject_id>/cards")
+def study_api_cards(subject_id):
+    """Return the next batch of cards to study.
+
+    Query parameters: n (batch size) and x (comma-separated card ids the
+    client already holds). Each card is {"i": id, "q": question, "a": answer}.
+    """
+    subject = Subject.query.get_or_404(subject_id)
+    if not entitlements.can_study(current_user, subject):
+        return {"error": "access denied"}, 403
 
-@app.route("/subject/<int:subject_id>")
+    count = min(max(request.args.get("n", STUDY_BATCH_SIZE, type=int), 1), STUDY_BATCH_MAX)
+    # ASCII digits only: str.isdigit() also accepts e.g. superscripts, which int() rejects
+    held = {int(i) for i in request.args.get("x", "").split(",")
+            if i.isascii() and i.isdigit() and len(i) <= MAX_ID_DIGITS}
+    if current_user.is_authenticated:
+        cards = study_queue.next_due_cards(current_user.id, subject_id, count, held)
+    else:
+        cards = card_selection.sample_cards(subject_id, count)
+
+    response = compact_json({
+        "s": subject_id,
+        "c": [{"i": card.id, "q": card.question, "a": card.answer} for card in cards],
+    })
+    response.headers["Cache-Control"] = "private, no-store"
+    return response
+
+@bp.route("/api/study/<int:subject_id>/grades", methods=["POST"])
+def study_api_grades(subject_id):
+    """Apply a batch of grades: {"g": [{"i": card id, "g": grade}, ...]}.
+
+    Responds with the number applied and the card ids that were rejected.
+    """
+    if not current_user.is_authenticated:
+        return {"error": "login required"}, 401
+    subject = Subject.query.get_or_404(subject_id)
+    if not entitlements.can_study(current_user, subject):
+        return {"error": "access denied"}, 403
+
+    payload = request.get_json(silent=True)
+    items = payload.get("g") if isinstance(payload, dict) else None
+    if not isinstance(items, list) or len(items) > STUDY_GRADES_MAX:
+        return {"error": f"expected up to {STUDY_GRADES_MAX} grades in 'g'"}, 400
+    grades = [(item.get("i"), item.get("g")) for item in items
+              if isinstance(item, dict) and type(item.get("i")) is int and 0 < item["i"] <= MAX_ID]
+
+    applied = study_queue.record_grades(current_user.id, subject_id, grades)
+    for card_id, grade in applied:
+        review_log.record(current_user.id, subject_id, card_id, "grade", grade)
+    applied_ids = {card_id for card_id, _ in applied}
+    return compact_json({
+        "n": len(applied),
+        "r": sorted({card_id for card_id, _ in grades if card_id not in applied_ids}),
+    })
+
+@bp.route("/subject/<int:subject_id>")
 @login_required
 def view_subject(subject_id):
     subject = Subject.query.get_or_404(subject_id)
-    if subject.user_id != current_user.id and current_user.role != 'admin':
+    if not entitlements.can_manage(current_user, subject):
         flash("Access denied.", "error")
-        return redirect(url_for('index'))
-    return render_template("view_subject.html", subject=subject)
+        return redirect(url_for('main.index'))
+    return render_template("view_subject.html", subject=subject,
+                           cards_html=subject_cards_fragment(subject),
+                           card_count=card_selection.card_count(subject.id, subject.version))
 
-@app.route("/subject/<int:subject_id>/toggle_public", methods=["POST"])
+@bp.route("/subject/<int:subject_id>/export.<fmt>")
+def export_subject(subject_id, fmt):
+    subject = Subject.query.get_or_404(subject_id)
+    if fmt not in deck_export.FORMATS or not entitlements.can_study(current_user, subject):
+        abort(404)
+
+    response = Response(stream_with_context(deck_export.EXPORTERS[fmt](subject.id)),
+                        mimetype=deck_export.FORMATS[fmt])
+    response.set_etag(deck_export.etag(subject, fmt))
+    response.last_modified = subject.updated_at
+    response.cache_control.no_cache = True
+    if subject.is_public:
+        response.cache_control.public = True
+    else:
+        response.cache_control.private = True
+    response.vary.add("Cookie")
+    response.headers["Content-Disposition"] = f'attachment; filename="subject-{subject.id}.{fmt}"'
+    return response.make_conditional(request)
+
+@bp.route("/subject/<int:subject_id>/toggle_public", methods=["POST"])
 @login_required
 def toggle_public(subject_id):
     subject = Subject.query.get_or_404(subject_id)
     if subject.user_id != current_user.id:
         flash("Access denied.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     subject.is_public = not subject.is_public
+    subject_changed(subject.id)
     db.session.commit()
+    entitlements.invalidate_subject(subject.id)
     status = "public" if subject.is_public else "private"
     flash(f"Subject is now {status}.", "success")
-    return redirect(url_for('view_subject', subject_id=subject.id))
+    return redirect(url_for('main.view_subject', subject_id=subject.id))
 
-@app.route("/admin/users")
+@bp.route("/subject/<int:subject_id>/reset_progress", methods=["POST"])
+@login_required
+def reset_progress(subject_id):
+    subject = Subject.query.get_or_404(subject_id)
+    if not entitlements.can_manage(current_user, subject):
+        flash("Access denied.", "error")
+        return redirect(url_for('main.index'))
+
+    study_queue.forget_subject(subject.id)
+    db.session.commit()
+    flash("Study progress has been reset for all learners.", "success")
+    return redirect(url_for('main.view_subject', subject_id=subject.id))
+
+@bp.route("/admin/users")
 @login_required
 def admin_users():
     if current_user.role != 'admin':
         flash("Access denied. Admin privileges required.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
-    users = User.query.all()
-    return render_template("admin_users.html", users=users)
+    role = request.args.get("role", "")
+    sort = request.args.get("sort", "id")
+    descending = request.args.get("dir") == "desc"
+
+    query = User.query
+    if role in ROLES:
+        query = query.filter(User.role == role)
+    sort_column = ADMIN_USER_SORTS.get(sort, User.id)
+
+    users, next_cursor = keyset.paginate(query, sort_column, User.id,
+                                         after=request.args.get("after"),
+                                         descending=descending,
+                                         per_page=ADMIN_PAGE_SIZE)
+    return render_template("admin_users.html",
+                           users=users,
+                           subject_counts=dashboard.subject_counts([u.id for u in users]),
+                           next_cursor=next_cursor,
+                           role=role, sort=sort, descending=descending,
+                           deletions=deletion.jobs())
+
+@bp.route("/admin/sql_stats", methods=["GET", "POST"])
+@login_required
+def admin_sql_stats():
+    if current_user.role != 'admin':
+        flash("Access denied. Admin privileges required.", "error")
+        return redirect(url_for('main.index'))
+
+    if request.method == "POST":
+        sql_stats.reset()
+        db_pool.reset_metrics(db.engine)
+        fragment_cache.reset_stats()
+        flash("SQL statistics cleared.", "success")
+        return redirect(url_for('main.admin_sql_stats'))
+
+    return render_template("admin_sql_stats.html",
+                           enabled=sql_stats.is_enabled(current_app),
+                           endpoints=sql_stats.snapshot(),
+                           pool=db_pool.snapshot(db.engine),
+                           fragments=fragment_cache.snapshot())
+
+@bp.route("/admin/pool_stats.json")
+@login_required
+def admin_pool_stats():
+    if current_user.role != 'admin':
+        abort(403)
+    return db_pool.snapshot(db.engine)
+
+@bp.route("/admin/fragment_cache.json")
+@login_required
+def admin_fragment_cache():
+    if current_user.role != 'admin':
+        abort(403)
+    return fragment_cache.snapshot()
 
-@app.route("/admin/subjects")
+@bp.route("/admin/subjects")
 @login_required
 def admin_subjects():
     if current_user.role != 'admin':
         flash("Access denied. Admin privileges required.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
-    subjects = Subject.query.all()
-    return render_template("admin_subjects.html", subjects=subjects)
-
-@app.route("/admin/users/delete/<int:user_id>", methods=["POST"])
+    owner = request.args.get("owner", "").strip()
+    for_sale = request.args.get("for_sale", "")
+    sort = request.args.get("sort", "id")
+    descending = request.args.get("dir") == "desc"
+
+    query = Subject.query.options(joinedload(Subject.user))
+    if owner:
+        query = query.join(User, User.id == Subject.user_id).filter(User.username == owner)
+    if for_sale == "yes":
+        query = query.filter(Subject.is_for_sale.is_(True))
+    elif for_sale == "no":
+        query = query.filter(db.or_(Subject.is_for_sale.is_(False), Subject.is_for_sale.is_(None)))
+    sort_column = ADMIN_SUBJECT_SORTS.get(sort, Subject.id)
+
+    subjects, next_cursor = keyset.paginate(query, sort_column, Subject.id,
+                                            after=request.args.get("after"),
+                                            descending=descending,
+                                            per_page=ADMIN_PAGE_SIZE)
+    return render_template("admin_subjects.html",
+                           subjects=subjects,
+                           card_counts=dashboard.card_counts([s.id for s in subjects]),
+                           next_cursor=next_cursor,
+                           owner=owner, for_sale=for_sale, sort=sort, descending=descending,
+                           deletions=deletion.jobs())
+
+@bp.route("/admin/users/delete/<int:user_id>", methods=["POST"])
 @login_required
 def delete_user(user_id):
     if current_user.role != 'admin':
         flash("Access denied. Admin privileges required.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     user = User.query.get_or_404(user_id)
     if user.id == current_user.id:
         flash("You cannot delete yourself.", "error")
-        return redirect(url_for('admin_users'))
-        
-    db.session.delete(user)
-    db.session.commit()
-    flash(f"User {user.username} deleted successfully.", "success")
-    return redirect(url_for('admin_users'))
+        return redirect(url_for('main.admin_users'))
+
+    username = user.username
+    job = deletion.delete_user(user_id)
+    if job:
+        flash(f"Deleting user {username} and {job.total} cards in the background.", "info")
+    else:
+        flash(f"User {username} deleted successfully.", "success")
+    return redirect(url_for('main.admin_users'))
 
-@app.route("/admin/users/change_role/<int:user_id>", methods=["POST"])
+@bp.route("/admin/users/change_role/<int:user_id>", methods=["POST"])
 @login_required
 def change_role(user_id):
     if current_user.role != 'admin':
         flash("Access denied. Admin privileges required.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     user = User.query.get_or_404(user_id)
     if user.id == current_user.id:
         flash("You cannot change your own role.", "error")
-        return redirect(url_for('admin_users'))
+        return redirect(url_for('main.admin_users'))
         
     new_role = request.form.get("role")
-    if new_role not in ['student', 'teacher', 'admin']:
+    if new_role not in ROLES:
         flash("Invalid role selected.", "error")
-        return redirect(url_for('admin_users'))
+        return redirect(url_for('main.admin_users'))
         
     user.role = new_role
     db.session.commit()
     flash(f"User {user.username}'s role changed to {new_role}.", "success")
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('main.admin_users'))
 
-@app.route("/admin/subjects/delete/<int:subject_id>", methods=["POST"])
+@bp.route("/admin/subjects/delete/<int:subject_id>", methods=["POST"])
 @login_required
 def delete_subject(subject_id):
     if current_user.role != 'admin':
         flash("Access denied. Admin privileges required.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
-    subject = Subject.query.get_or_404(subject_id)
-    db.session.delete(subject)
-    db.session.commit()
-    flash(f"Subject '{subject.name}' deleted successfully.", "success")
-    return redirect(url_for('admin_subjects'))
+    name = Subject.query.get_or_404(subject_id).name
+    job = deletion.delete_subject(subject_id)
+    if job:
+        flash(f"Deleting subject '{name}' and {job.total} cards in the background.", "info")
+    else:
+        flash(f"Subject '{name}' deleted successfully.", "success")
+    return redirect(url_for('main.admin_subjects'))
+
+@bp.route("/admin/deletions.json")
+@login_required
+def admin_deletions():
+    if current_user.role != 'admin':
+        abort(403)
+    return {"jobs": [job.as_dict() for job in deletion.jobs()]}
 
-@app.route("/admin/cards/delete/<int:card_id>", methods=["POST"])
+@bp.route("/admin/cards/delete/<int:card_id>", methods=["POST"])
 @login_required
 def delete_card(card_id):
     if current_user.role != 'admin':
         flash("Access denied. Admin privileges required.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     card = Flashcard.query.get_or_404(card_id)
     subject_id = card.subject_id
+    study_queue.forget_cards([card.id])
     db.session.delete(card)
+    subject_changed(subject_id)
     db.session.commit()
     flash("Flashcard deleted successfully.", "success")
-    return redirect(url_for('view_subject', subject_id=subject_id))
+    return redirect(url_for('main.view_subject', subject_id=subject_id))
+
+@bp.cli.command("reschedule-subject")
+@click.argument("subject_id", type=int)
+@click.option("--scale", default=1.0, show_default=True, help="Multiply every review interval by this factor.")
+def reschedule_subject_command(subject_id, scale):
+    """Recompute review intervals and due dates for a whole subject."""
+    count = study_queue.reschedule_subject(subject_id, scale)
+    click.echo(f"Rescheduled {count} review states.")
+
+@bp.cli.command("rebuild-progress")
+def rebuild_progress_command():
+    """Recompute the study progress rollups from the review event log."""
+    count = progress.rebuild()
+    click.echo(f"Rebuilt progress from {count} graded reviews.")
+
+@bp.cli.command("purge-sessions")
+def purge_sessions_command():
+    """Delete expired rows from the database session store."""
+    count = server_sessions.DatabaseStore().purge_expired()
+    click.echo(f"Purged {count} expired sessions.")
+
+@bp.cli.command("import-cards")
+@click.argument("subject_id", type=int)
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(card_import.FORMATS), help="Defaults to a guess from the file name.")
+@click.option("--batch-size", default=card_import.BATCH_SIZE, show_default=True)
+def import_cards_command(subject_id, path, fmt, batch_size):
+    """Import flashcards from a CSV/TSV/Anki text file into a subject."""
+    subject = db.session.get(Subject, subject_id)
+    if subject is None:
+        raise click.ClickException(f"Subject {subject_id} does not exist.")
+
+    with open(path, encoding="utf-8-sig", errors="replace", newline="") as stream:
+        result = card_import.import_cards(stream, subject.id, subject.user_id,
+                                          fmt or card_import.guess_format(path), batch_size)
+
+    click.echo(f"Imported {result.imported} cards in {result.elapsed:.2f}s "
+               f"({result.rows_per_sec:.0f} rows/sec).")
+    for line, reason in result.errors:
+        click.echo(f"Line {line}: {reason}", err=True)
+    if result.rejected:
+        click.echo(f"{result.rejected} rows rejected.", err=True)
+
+@bp.cli.command("upgrade-db")
+def upgrade_db_command():
+    """Create or migrate the database schema, adopting pre-migration databases."""
+    schema.upgrade_database()
+
+@bp.cli.command("explain-hot-queries")
+def explain_hot_queries_command():
+    """Print the query plan of each hot lookup."""
+    for name, statement in schema.hot_queries():
+        click.echo(f"== {name}")
+        for line in schema.explain(statement):
+            click.echo(f"   {line}")
 
 if __name__ == "__main__":
+    app = create_app()
     with app.app_context():
-        db.create_all()  # Create database tables
-        app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+        schema.upgrade_database()  # Create or migrate database tables
+    warm_up_pool(app)
+    app.run(host='0.0.0.0', port=5000)
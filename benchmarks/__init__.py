@@ -0,0 +1 @@
+"""Benchmarks for the flash cards app. Run each module with ``python -m benchmarks.<name>``."""
@@ -0,0 +1,226 @@
+"""Generate a reproducible synthetic dataset.
+
+Teachers own classrooms full of students, every teacher has a large deck
+attached to one of their classrooms, other decks are public or for sale,
+and students have purchases, review states and a graded review history so
+the progress rollups are populated too. The same seed always produces the
+same data.
+
+    python -m benchmarks.datagen --scale medium --out /tmp/flashcards-bench.db
+
+A summary with the ids the route benchmark needs is written next to the
+database as <out>.json.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+SCALES = {
+    "small": {"teachers": 3, "classes_per_teacher": 2, "students_per_class": 20,
+              "extra_subjects": 5, "cards": (1000, 5000), "reviews_per_student": 50},
+    "medium": {"teachers": 5, "classes_per_teacher": 2, "students_per_class": 30,
+               "extra_subjects": 10, "cards": (10000, 50000), "reviews_per_student": 200},
+    "large": {"teachers": 20, "classes_per_teacher": 3, "students_per_class": 40,
+              "extra_subjects": 40, "cards": (10000, 50000), "reviews_per_student": 500},
+}
+
+PASSWORD = "benchmark"
+BATCH_SIZE = 5000
+
+WORDS = ("cell membrane protein enzyme river delta valley theorem proof integral vector "
+         "matrix verb noun clause treaty empire dynasty atom molecule orbit planet "
+         "function variable syntax compiler network packet router").split()
+
+
+def sqlite_url(path):
+    return "sqlite:///" + os.path.abspath(path)
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _insert(model, rows):
+    from models import db
+
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(db.insert(model), rows[start:start + BATCH_SIZE])
+
+
+def generate(scale="medium", seed=1234):
+    """Fill the app's (empty, migrated) database with a synthetic dataset.
+
+    Must be called inside an app context. Returns a dict describing what was
+    generated, including the ids the benchmark scenarios use.
+    """
+    from werkzeug.security import generate_password_hash
+
+    from models import (db, User, Subject, Flashcard, Purchase, Classroom, ClassMembership,
+                        ReviewState, ReviewEvent)
+    import passwords
+    import progress
+    import scheduler
+
+    params = SCALES[scale]
+    rng = random.Random(seed)
+    # One hash shared by every user, made with the configured method so
+    # that logging in does not trigger a rehash
+    password_hash = generate_password_hash(PASSWORD, passwords.hash_method())
+
+    users, next_user = [], 1
+
+    def add_user(role):
+        nonlocal next_user
+        users.append({"id": next_user, "username": f"{role}{next_user}",
+                      "email": f"{role}{next_user}@example.com",
+                      "password_hash": password_hash, "role": role})
+        next_user += 1
+        return next_user - 1
+
+    admin_id = add_user("admin")
+    teacher_ids = [add_user("teacher") for _ in range(params["teachers"])]
+
+    classrooms, memberships, class_students = [], [], {}
+    for teacher_id in teacher_ids:
+        for _ in range(params["classes_per_teacher"]):
+            classroom_id = len(classrooms) + 1
+            classrooms.append({"id": classroom_id, "name": f"Class {classroom_id}",
+                               "teacher_id": teacher_id})
+            class_students[classroom_id] = [add_user("student")
+                                            for _ in range(params["students_per_class"])]
+            memberships.extend({"user_id": student_id, "classroom_id": classroom_id}
+                               for student_id in class_students[classroom_id])
+    student_ids = [student_id for ids in class_students.values() for student_id in ids]
+
+    subjects, subject_cards = [], {}
+
+    def add_subject(owner_id, cards, **fields):
+        subject_id = len(subjects) + 1
+        subjects.append({"id": subject_id, "name": f"{rng.choice(WORDS).title()} {subject_id}",
+                         "user_id": owner_id, "classroom_id": None, "is_public": False,
+                         "is_for_sale": False, "price": 0.0, **fields})
+        subject_cards[subject_id] = (owner_id, cards)
+        return subject_id
+
+    low, high = params["cards"]
+    class_subjects = {}
+    for classroom in classrooms[::params["classes_per_teacher"]]:
+        class_subjects[classroom["id"]] = add_subject(
+            classroom["teacher_id"], rng.randint(low, high), classroom_id=classroom["id"])
+    for n in range(params["extra_subjects"]):
+        owner_id = rng.choice(teacher_ids + student_ids)
+        if n % 2:
+            add_subject(owner_id, rng.randint(low // 10, low), is_public=True)
+        else:
+            add_subject(owner_id, rng.randint(low // 10, low), is_for_sale=True,
+                        price=round(rng.uniform(1, 20), 2))
+
+    for_sale = [s["id"] for s in subjects if s["is_for_sale"]]
+    purchases = [{"user_id": student_id, "subject_id": subject_id}
+                 for student_id in student_ids
+                 for subject_id in rng.sample(for_sale, min(len(for_sale), 2))]
+
+    started = time.perf_counter()
+    _insert(User, users)
+    _insert(Classroom, classrooms)
+    _insert(ClassMembership, memberships)
+    _insert(Subject, subjects)
+    _insert(Purchase, purchases)
+
+    card_ids, next_card = {}, 1
+    for subject_id, (owner_id, count) in subject_cards.items():
+        rows = [{"id": next_card + n, "question": _text(rng, 8) + "?", "answer": _text(rng, 5),
+                 "user_id": owner_id, "subject_id": subject_id} for n in range(count)]
+        _insert(Flashcard, rows)
+        card_ids[subject_id] = (next_card, next_card + count - 1)
+        next_card += count
+
+    # Each student works through the deck attached to their classroom
+    now = scheduler.utcnow()
+    states, events = [], []
+    for classroom_id, subject_id in class_subjects.items():
+        first, last = card_ids[subject_id]
+        for student_id in class_students[classroom_id]:
+            seen = rng.sample(range(first, last + 1), min(params["reviews_per_student"], last - first + 1))
+            for n, card_id in enumerate(seen):
+                reviewed_at = now - timedelta(days=len(seen) - n, minutes=rng.randint(0, 600))
+                grade = rng.choices(scheduler.GRADES, weights=(2, 2, 5, 1))[0]
+                ease, interval, repetitions, lapses = scheduler.next_state(
+                    scheduler.DEFAULT_EASE, 0.0, 0, 0, grade)
+                states.append({"user_id": student_id, "card_id": card_id, "subject_id": subject_id,
+                               "ease": ease, "interval": interval, "repetitions": repetitions,
+                               "lapses": lapses, "last_reviewed_at": reviewed_at,
+                               "due_at": scheduler.due_date(reviewed_at, interval)})
+                events.append({"user_id": student_id, "subject_id": subject_id, "card_id": card_id,
+                               "action": "grade", "grade": grade, "created_at": reviewed_at})
+    _insert(ReviewState, states)
+    _insert(ReviewEvent, events)
+    db.session.commit()
+    progress.rebuild()
+
+    busiest = max(class_subjects, key=lambda c: subject_cards[class_subjects[c]][1])
+    return {
+        "scale": scale,
+        "seed": seed,
+        "users": len(users),
+        "classrooms": len(classrooms),
+        "subjects": len(subjects),
+        "cards": next_card - 1,
+        "purchases": len(purchases),
+        "review_states": len(states),
+        "seconds": time.perf_counter() - started,
+        "password": PASSWORD,
+        "admin": users[admin_id - 1]["username"],
+        "teacher": users[classrooms[busiest - 1]["teacher_id"] - 1]["username"],
+        "student": users[class_students[busiest][0] - 1]["username"],
+        "student_id": class_students[busiest][0],
+        "classroom_id": busiest,
+        "subject_id": class_subjects[busiest],
+    }
+
+
+def create_app(url):
+    """Create the app on the database at `url`, ignoring any Cloud SQL settings."""
+    os.environ.pop("INSTANCE_CONNECTION_NAME", None)
+    from app import create_app
+
+    return create_app({"SQLALCHEMY_DATABASE_URI": url})
+
+
+def create_database(url, scale="medium", seed=1234):
+    """Create a fresh database at `url`, migrate it and fill it.
+
+    Returns the app and generate()'s summary.
+    """
+    import schema
+
+    app = create_app(url)
+    with app.app_context():
+        schema.upgrade_database()
+        return app, generate(scale, seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", choices=SCALES, default="medium")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--out", required=True, help="SQLite file to create (must not exist)")
+    args = parser.parse_args()
+
+    if os.path.exists(args.out):
+        sys.exit(f"{args.out} already exists")
+    _, summary = create_database(sqlite_url(args.out), args.scale, args.seed)
+    # route_benchmark --db reads the scenario ids from here
+    with open(args.out + ".json", "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Generated {summary['users']} users, {summary['classrooms']} classrooms, "
+          f"{summary['subjects']} subjects, {summary['cards']} cards and "
+          f"{summary['review_states']} review states in {summary['seconds']:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measure login throughput for different password hashing settings.
+
+For each hash method and pool size, a batch of concurrent logins is
+verified through the passwords module and the rate is reported overall and
+per core used.
+
+    python -m benchmarks.password_benchmark
+    python -m benchmarks.password_benchmark --methods scrypt,pbkdf2:sha256:600000 --workers 0,2,4
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+from werkzeug.security import generate_password_hash
+
+import passwords
+
+DEFAULT_METHODS = "scrypt,pbkdf2:sha256:600000,pbkdf2:sha256:100000"
+
+
+def run(method, workers, logins, threads):
+    os.environ["PASSWORD_HASH_WORKERS"] = str(workers)
+    passwords.shutdown()
+    stored = generate_password_hash("correct horse battery staple", method)
+
+    # Start the pool before timing so process spawn cost is not counted
+    passwords.verify_password(stored, "correct horse battery staple")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(
+            lambda _: passwords.verify_password(stored, "correct horse battery staple"),
+            range(logins)))
+    elapsed = time.perf_counter() - start
+    assert all(results)
+
+    cores = min(workers, os.cpu_count() or 1) if workers > 0 else 1
+    rate = logins / elapsed
+    return rate, rate / cores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--methods", default=DEFAULT_METHODS,
+                        help=f"comma-separated werkzeug hash methods (default: {DEFAULT_METHODS})")
+    parser.add_argument("--workers", default=f"0,{os.cpu_count() or 1}",
+                        help="comma-separated pool sizes; 0 hashes in the calling thread")
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=16, help="concurrent login requests")
+    args = parser.parse_args()
+
+    print(f"{'method':<28}{'workers':>8}{'logins/s':>12}{'per core':>12}")
+    try:
+        for method in args.methods.split(","):
+            for workers in [int(w) for w in args.workers.split(",")]:
+                rate, per_core = run(method.strip(), workers, args.logins, args.threads)
+                print(f"{method:<28}{workers:>8}{rate:>12.1f}{per_core:>12.1f}")
+    finally:
+        passwords.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Measure the app's heaviest routes in-process against a synthetic dataset.
+
+Each scenario logs in as the right kind of user and requests a real route
+through the Flask test client. For every scenario the report gives the
+number of SQL queries per request, p50/p95/p99 latency and the peak memory
+allocated while serving one request. Results can be saved as JSON and
+compared against an earlier run, failing when a route got slower or started
+issuing more queries.
+
+    python -m benchmarks.route_benchmark --scale small --json results.json
+    python -m benchmarks.route_benchmark --db /tmp/bench.db --compare baseline.json
+
+Without --db a fresh dataset is generated into a temporary SQLite file.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import datagen
+
+SCENARIOS = ("index", "study", "view_class", "view_student_progress", "view_subject",
+             "admin_subjects")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class QueryCounter:
+    """Counts statements executed on an engine."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def scenarios(summary):
+    """Return {name: (username, request function)} for the dataset described by `summary`."""
+    subject_id = summary["subject_id"]
+    return {
+        "index": (summary["teacher"], lambda c: c.get("/")),
+        "study": (summary["student"],
+                  lambda c: c.post(f"/study/{subject_id}", data={"grade": "good"})),
+        "view_class": (summary["teacher"], lambda c: c.get(f"/class/{summary['classroom_id']}")),
+        "view_student_progress": (
+            summary["teacher"],
+            lambda c: c.get(f"/class/{summary['classroom_id']}/student/{summary['student_id']}")),
+        "view_subject": (summary["admin"], lambda c: c.get(f"/subject/{subject_id}")),
+        "admin_subjects": (summary["admin"], lambda c: c.get("/admin/subjects")),
+    }
+
+
+def measure(counter, client, request, iterations, warmup, memory_samples):
+    for _ in range(warmup):
+        request(client)
+
+    latencies, queries = [], []
+    for _ in range(iterations):
+        before = counter.count
+        start = time.perf_counter()
+        response = request(client)
+        latencies.append(time.perf_counter() - start)
+        queries.append(counter.count - before)
+        if response.status_code >= 400:
+            raise RuntimeError(f"Request failed with {response.status_code}")
+
+    peaks = []
+    for _ in range(memory_samples):
+        tracemalloc.start()
+        request(client)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "requests": iterations,
+        "queries": statistics.mean(queries),
+        "max_queries": max(queries),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_kib": max(peaks) / 1024 if peaks else None,
+    }
+
+
+def run(app, summary, names, iterations, warmup, memory_samples):
+    from models import db
+
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+
+    results = {}
+    for name, (username, request) in scenarios(summary).items():
+        if name not in names:
+            continue
+        client = app.test_client()
+        response = client.post("/login", data={"username": username, "password": summary["password"]})
+        if response.status_code != 302:
+            raise RuntimeError(f"Could not log in as {username}")
+        client.get(f"/study/{summary['subject_id']}")  # start a study session for the study scenario
+        results[name] = measure(counter, client, request, iterations, warmup, memory_samples)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, threshold):
+    """Return a list of regression messages between two result files."""
+    problems = []
+    for name, result in current["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if before is None:
+            continue
+        if result["queries"] > before["queries"]:
+            problems.append(f"{name}: {before['queries']:.1f} -> {result['queries']:.1f} queries")
+        for key in ("p50_ms", "p95_ms"):
+            if result[key] > before[key] * (1 + threshold):
+                problems.append(f"{name}: {key} {before[key]:.2f} -> {result[key]:.2f}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", help="existing SQLite file made by benchmarks.datagen")
+    parser.add_argument("--scale", choices=datagen.SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--memory-samples", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="write the results to this file")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed latency increase over the baseline (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    # Keep password checks in-process; their cost is measured by password_benchmark
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.db:
+            summary_path = args.db + ".json"
+            if not os.path.exists(summary_path):
+                sys.exit(f"{summary_path} not found; generate the database with benchmarks.datagen")
+            with open(summary_path) as f:
+                summary = json.load(f)
+            app = datagen.create_app(datagen.sqlite_url(args.db))
+        else:
+            app, summary = datagen.create_database(datagen.sqlite_url(os.path.join(tmp, "bench.db")),
+                                                   args.scale, args.seed)
+
+        routes = run(app, summary, args.scenarios.split(","), args.iterations, args.warmup,
+                     args.memory_samples)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "dataset": {key: summary[key] for key in ("scale", "seed", "users", "subjects", "cards")},
+        "routes": routes,
+    }
+
+    print(f"{'scenario':<24}{'queries':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KiB':>10}")
+    for name, result in routes.items():
+        print(f"{name:<24}{result['queries']:>9.1f}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+              f"{result['p99_ms']:>10.2f}{result['peak_kib']:>10.0f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("dataset") != report["dataset"]:
+            print("warning: the baseline was measured on a different dataset", file=sys.stderr)
+        problems = compare(baseline, report, args.threshold)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
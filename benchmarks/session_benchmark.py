@@ -0,0 +1,83 @@
+"""Compare cookie sessions with the server-side session backends.
+
+A logged-in student steps through a study session (show, next, show, ...)
+with every backend in turn. The session also carries a queue of card ids of
+--queue-size entries, standing in for richer study state. The report gives
+request latency and the session bytes sent on the wire per request, both
+the Cookie header from the client and Set-Cookie headers from the server.
+
+    python -m benchmarks.session_benchmark --queue-size 200
+    python -m benchmarks.session_benchmark --backends cookie,memory,redis --redis-url redis://localhost:6379/1
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks import datagen
+from benchmarks.route_benchmark import percentile
+
+DEFAULT_BACKENDS = "cookie,memory,database"
+
+
+def run(app, summary, backend, config, steps, queue_size):
+    from flask.sessions import SecureCookieSessionInterface
+
+    import server_sessions
+
+    app.session_interface = (server_sessions.make_interface(backend, config)
+                             or SecureCookieSessionInterface())
+    cookie_name = app.config["SESSION_COOKIE_NAME"]
+    subject_id = summary["subject_id"]
+
+    client = app.test_client()
+    client.post("/login", data={"username": summary["student"], "password": summary["password"]})
+    with client.session_transaction() as session:
+        session["queue"] = list(range(1, queue_size + 1))
+    client.get(f"/study/{subject_id}")
+
+    latencies, sent, received = [], 0, 0
+    for step in range(steps):
+        cookie = client.get_cookie(cookie_name)
+        sent += len(cookie_name) + 1 + len(cookie.value) if cookie else 0
+        start = time.perf_counter()
+        response = client.post(f"/study/{subject_id}", data={"show" if step % 2 == 0 else "next": ""})
+        latencies.append(time.perf_counter() - start)
+        received += sum(len(header) for header in response.headers.getlist("Set-Cookie"))
+
+    latencies.sort()
+    return {
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "cookie_bytes": sent / steps,
+        "set_cookie_bytes": received / steps,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backends", default=DEFAULT_BACKENDS,
+                        help=f"comma-separated backends (default: {DEFAULT_BACKENDS})")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--queue-size", type=int, default=100,
+                        help="card ids kept in the session as extra study state")
+    args = parser.parse_args()
+
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+    config = {"SESSION_REDIS_URL": args.redis_url}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app, summary = datagen.create_database(datagen.sqlite_url(os.path.join(tmp, "bench.db")), "small")
+
+        print(f"{'backend':<12}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}{'cookie B':>10}{'set-cookie B':>14}")
+        for backend in args.backends.split(","):
+            result = run(app, summary, backend.strip(), config, args.steps, args.queue_size)
+            print(f"{backend:<12}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['mean_ms']:>10.2f}"
+                  f"{result['cookie_bytes']:>10.0f}{result['set_cookie_bytes']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Measure cold start: importing the app, creating it and serving the first request.
+
+Each run happens in a fresh interpreter. The preforked runs create the app
+once in a parent process and then fork workers, as gunicorn --preload does,
+timing each worker's first request, with and without template
+precompilation.
+
+    python -m benchmarks.startup_benchmark --runs 5 --workers 4
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import json, os, sys, time
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+app = app_module.create_app({"SQLALCHEMY_DATABASE_URI": sys.argv[1],
+                             "PRECOMPILE_TEMPLATES": sys.argv[2] == "1"})
+created = time.perf_counter()
+
+def first_request():
+    start = time.perf_counter()
+    app.test_client().get("/login")
+    return time.perf_counter() - start
+
+workers = int(sys.argv[3])
+if not workers:
+    print(json.dumps({"import": imported - start, "create": created - imported,
+                      "first_request": first_request(),
+                      "modules": len(sys.modules)}))
+else:
+    results = []
+    for _ in range(workers):
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            os.write(write, repr(first_request()).encode())
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as pipe:
+            results.append(float(pipe.read()))
+        os.waitpid(pid, 0)
+    print(json.dumps({"worker_first_request": results}))
+"""
+
+
+def child(url, precompile, workers=0):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PASSWORD_HASH_WORKERS="0")
+    env.pop("INSTANCE_CONNECTION_NAME", None)
+    output = subprocess.check_output(
+        [sys.executable, "-c", CHILD, url, "1" if precompile else "0", str(workers)],
+        cwd=root, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def ms(values):
+    return f"{statistics.median(values) * 1000:>10.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4,
+                        help="workers forked per preforked run (0 to skip)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = "sqlite:///" + os.path.join(tmp, "startup.db")
+        print(f"{'mode':<28}{'import ms':>10}{'create ms':>10}{'1st req ms':>11}{'modules':>9}")
+        for precompile in (False, True):
+            runs = [child(url, precompile) for _ in range(args.runs)]
+            label = "fresh process" + (", precompiled" if precompile else "")
+            print(f"{label:<28}{ms([r['import'] for r in runs])}{ms([r['create'] for r in runs])}"
+                  f" {ms([r['first_request'] for r in runs])}{runs[0]['modules']:>9}")
+
+        if args.workers and hasattr(os, "fork"):
+            print()
+            print(f"{'preforked workers':<28}{'1st req ms':>11}")
+            for precompile in (False, True):
+                times = [t for _ in range(args.runs)
+                         for t in child(url, precompile, args.workers)["worker_first_request"]]
+                label = "precompiled" if precompile else "compiled on demand"
+                print(f"{label:<28} {ms(times)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Streaming bulk import of flashcards from CSV, TSV or Anki text exports.
+
+Rows are read one at a time and inserted in batches, so memory use does not
+grow with the size of the file.
+"""
+import csv
+import os
+import time
+
+from models import db, Flashcard, Subject
+import card_selection
+import fragment_cache
+
+FORMATS = ('csv', 'tsv', 'anki')
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+_anki_separators = {
+    'tab': '\t',
+    'comma': ',',
+    'semicolon': ';',
+    'pipe': '|',
+    'space': ' ',
+}
+
+
+class ImportResult:
+    """Summary of a bulk import."""
+
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.imported / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, line, reason):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, reason))
+
+
+def guess_format(filename):
+    """Guess the import format from a file name, defaulting to CSV."""
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext in ('.tsv', '.tab'):
+        return 'tsv'
+    if ext == '.txt':
+        return 'anki'
+    return 'csv'
+
+
+def _iter_anki_lines(stream):
+    """Skip the '#key:value' headers of an Anki export.
+
+    Returns (delimiter, number of header lines, data lines).
+    """
+    delimiter = '\t'
+    lines = iter(stream)
+    for skipped, line in enumerate(lines):
+        if not line.startswith('#'):
+            return delimiter, skipped, _chain(line, lines)
+        key, _, value = line[1:].strip().partition(':')
+        if key == 'separator':
+            delimiter = _anki_separators.get(value.lower(), value[:1] or '\t')
+    return delimiter, 0, iter(())
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def iter_rows(stream, fmt='csv'):
+    """Yield (line_number, fields, error) for every row of an import file.
+
+    Rows the CSV parser cannot read (a NUL byte, a field over the parser's
+    size limit...) come back with fields set to None and the parser's error
+    message; reading carries on with the next line.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+    offset = 0
+    if fmt == 'anki':
+        delimiter, offset, lines = _iter_anki_lines(stream)
+        reader = csv.reader(lines, delimiter=delimiter)
+    else:
+        reader = csv.reader(stream, delimiter='\t' if fmt == 'tsv' else ',')
+
+    while True:
+        try:
+            fields = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield reader.line_num + offset, None, str(e)
+            continue
+        yield reader.line_num + offset, fields, None
+
+
+def import_cards(stream, subject_id, user_id, fmt='csv', batch_size=BATCH_SIZE):
+    """Import cards from a text stream into a subject.
+
+    Each row needs a question and an answer in its first two columns. A
+    leading "question,answer" header row is skipped. Valid rows are inserted
+    and committed `batch_size` at a time. The cards are owned by `user_id`;
+    both the web and CLI imports pass the subject's owner.
+    """
+    result = ImportResult()
+    start = time.perf_counter()
+    batch = []
+    first = True
+
+    for line, fields, error in iter_rows(stream, fmt):
+        is_first, first = first, False
+        if error:
+            result.reject(line, error)
+            continue
+        if not fields or not any(f.strip() for f in fields):
+            continue
+        if is_first and [f.strip().lower() for f in fields[:2]] == ['question', 'answer']:
+            continue
+        if len(fields) < 2:
+            result.reject(line, "expected a question and an answer")
+            continue
+        question, answer = fields[0].strip(), fields[1].strip()
+        if not question or not answer:
+            result.reject(line, "question and answer must not be empty")
+            continue
+
+        batch.append({"question": question, "answer": answer,
+                      "user_id": user_id, "subject_id": subject_id})
+        if len(batch) >= batch_size:
+            _flush(batch, result)
+
+    if batch:
+        _flush(batch, result)
+
+    if result.imported:
+        Subject.bump_version(subject_id)
+        db.session.commit()
+        card_selection.invalidate(subject_id)
+        fragment_cache.invalidate_subject(subject_id)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _flush(batch, result):
+    db.session.execute(db.insert(Flashcard), batch)
+    db.session.commit()
+    result.imported += len(batch)
+    batch.clear()
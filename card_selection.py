@@ -0,0 +1,124 @@
+from array import array
+from collections import OrderedDict
+import random
+import threading
+import time
+
+from models import db, Flashcard
+
+# Cached card ids are also refreshed after this many seconds so that cards
+# created or deleted by another worker process eventually become visible.
+CARD_ID_TTL = 60
+# The least recently used subjects are evicted once the cache holds more
+# ids than this (8 bytes each).
+MAX_CACHED_IDS = 2_000_000
+
+_card_ids = OrderedDict()  # subject_id -> (loaded_at, ids, version), least recently used first
+_cached_ids = 0
+_last_sweep = 0.0
+_lock = threading.Lock()
+
+
+def _load_card_ids(subject_id):
+    """Load the ids of every card in a subject into a compact array."""
+    rows = db.session.execute(
+        db.select(Flashcard.id).filter_by(subject_id=subject_id).order_by(Flashcard.id)
+    )
+    return array('q', rows.scalars())
+
+
+def get_card_ids(subject_id, version=None):
+    """Return the cached array of card ids for a subject.
+
+    Pass the subject's current version, when the caller has it, to reload
+    ids cached before a change made by another worker process.
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _card_ids.get(subject_id)
+        if (entry is not None and now - entry[0] < CARD_ID_TTL
+                and (version is None or entry[2] == version)):
+            _card_ids.move_to_end(subject_id)
+            return entry[1]
+
+    ids = _load_card_ids(subject_id)
+    with _lock:
+        _store(subject_id, (now, ids, version), now)
+    return ids
+
+
+def _pop(subject_id):
+    # Called with the lock held
+    global _cached_ids
+    entry = _card_ids.pop(subject_id, None)
+    if entry is not None:
+        _cached_ids -= len(entry[1])
+
+
+def _store(subject_id, entry, now):
+    # Called with the lock held
+    global _cached_ids, _last_sweep
+    _pop(subject_id)
+    _card_ids[subject_id] = entry
+    _cached_ids += len(entry[1])
+    if now - _last_sweep >= CARD_ID_TTL:
+        # Expired entries of subjects nobody studies any more would
+        # otherwise only leave through LRU eviction
+        _last_sweep = now
+        for expired in [key for key, (loaded_at, _, _) in _card_ids.items() if now - loaded_at >= CARD_ID_TTL]:
+            _pop(expired)
+    while _cached_ids > MAX_CACHED_IDS and len(_card_ids) > 1:
+        _pop(next(iter(_card_ids)))
+
+
+def invalidate(subject_id):
+    """Drop the cached card ids for a subject."""
+    with _lock:
+        _pop(subject_id)
+
+
+def card_count(subject_id, version=None):
+    """Return the number of cards in a subject."""
+    return len(get_card_ids(subject_id, version))
+
+
+def has_cards(subject_id):
+    """Check whether a subject has any cards."""
+    return card_count(subject_id) > 0
+
+
+def get_card(subject_id, card_id):
+    """Fetch a single card, or None if it no longer belongs to the subject."""
+    if card_id is None:
+        return None
+    card = db.session.get(Flashcard, card_id)
+    if card is None or card.subject_id != subject_id:
+        return None
+    return card
+
+
+def pick_random_card(subject_id):
+    """Pick a random card from a subject, loading only that one row."""
+    for _ in range(2):
+        ids = get_card_ids(subject_id)
+        if not ids:
+            return None
+        card = get_card(subject_id, ids[random.randrange(len(ids))])
+        if card is not None:
+            return card
+        # The cached ids are stale (e.g. the card was deleted by another worker)
+        invalidate(subject_id)
+    return None
+
+
+def sample_cards(subject_id, count):
+    """Pick up to `count` distinct random cards from a subject in one query."""
+    ids = get_card_ids(subject_id)
+    chosen = random.sample(ids, min(count, len(ids)))
+    if not chosen:
+        return []
+    cards = {card.id: card for card in Flashcard.query.filter(
+        Flashcard.subject_id == subject_id, Flashcard.id.in_(chosen))}
+    if len(cards) < len(chosen):
+        invalidate(subject_id)
+    return [cards[card_id] for card_id in chosen if card_id in cards]
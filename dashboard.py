@@ -0,0 +1,71 @@
+from sqlalchemy.orm import joinedload
+
+from models import db, Flashcard, Subject, Purchase, Classroom, ClassMembership
+
+
+def card_counts(subject_ids):
+    """Return {subject_id: number of cards} using one grouped COUNT query."""
+    if not subject_ids:
+        return {}
+    rows = db.session.execute(
+        db.select(Flashcard.subject_id, db.func.count(Flashcard.id))
+        .filter(Flashcard.subject_id.in_(subject_ids))
+        .group_by(Flashcard.subject_id)
+    )
+    return dict(rows.all())
+
+
+def student_counts(classroom_ids):
+    """Return {classroom_id: number of students} using one grouped COUNT query."""
+    if not classroom_ids:
+        return {}
+    rows = db.session.execute(
+        db.select(ClassMembership.classroom_id, db.func.count(ClassMembership.id))
+        .filter(ClassMembership.classroom_id.in_(classroom_ids))
+        .group_by(ClassMembership.classroom_id)
+    )
+    return dict(rows.all())
+
+
+def subject_counts(user_ids):
+    """Return {user_id: number of subjects owned} using one grouped COUNT query."""
+    if not user_ids:
+        return {}
+    rows = db.session.execute(
+        db.select(Subject.user_id, db.func.count(Subject.id))
+        .filter(Subject.user_id.in_(user_ids))
+        .group_by(Subject.user_id)
+    )
+    return dict(rows.all())
+
+
+def load_dashboard(user):
+    """Collect everything dashboard.html needs in a fixed number of queries."""
+    subjects = Subject.query.filter_by(user_id=user.id).all()
+    purchased_subjects = (
+        Subject.query.join(Purchase, Purchase.subject_id == Subject.id)
+        .filter(Purchase.user_id == user.id)
+        .all()
+    )
+
+    classrooms = []
+    class_subjects = []
+    if user.role == 'teacher':
+        classrooms = Classroom.query.filter_by(teacher_id=user.id).all()
+    elif user.role == 'student':
+        class_subjects = (
+            Subject.query.join(ClassMembership, ClassMembership.classroom_id == Subject.classroom_id)
+            .filter(ClassMembership.user_id == user.id)
+            .options(joinedload(Subject.classroom))
+            .all()
+        )
+
+    subject_ids = {s.id for s in subjects + purchased_subjects + class_subjects}
+    return {
+        "subjects": subjects,
+        "purchased_subjects": purchased_subjects,
+        "classrooms": classrooms,
+        "class_subjects": class_subjects,
+        "card_counts": card_counts(subject_ids),
+        "student_counts": student_counts([c.id for c in classrooms]),
+    }
@@ -0,0 +1,180 @@
+"""Connection pool configuration, warm-up and metrics.
+
+Pool settings are read from the environment:
+
+    DB_POOL_SIZE        connections kept open (default 5)
+    DB_MAX_OVERFLOW     extra connections allowed under load (default 10)
+    DB_POOL_TIMEOUT     seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE     seconds before a connection is replaced (default 1800)
+    DB_POOL_PRE_PING    test connections before use, "1" or "0" (default 1)
+    DB_POOL_WARMUP      connections to open at startup (default 0)
+
+Warm-up opens connections in the process that calls it. With servers that
+load the app before forking (e.g. gunicorn --preload), call warm_up() from
+the server's post-fork hook instead so that workers do not share sockets;
+gunicorn.conf.py does this through app.warm_up_pool().
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool
+
+WARMUP_TIMEOUT = 30
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(environ, name, default):
+    try:
+        return int(environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def engine_options(environ):
+    """Build SQLAlchemy engine pool options from environment variables."""
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": _env_int(environ, "DB_POOL_SIZE", 5),
+        "max_overflow": _env_int(environ, "DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int(environ, "DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int(environ, "DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": environ.get("DB_POOL_PRE_PING", "1") not in ("0", "false", "no"),
+    }
+
+
+def warmup_size(environ):
+    """Return how many connections to open at startup."""
+    return _env_int(environ, "DB_POOL_WARMUP", 0)
+
+
+class PoolMetrics:
+    """Running totals of checkout waits and new-connection latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.connects = 0
+        self.connect_time = 0.0
+        self.max_connect = 0.0
+
+    def record_wait(self, elapsed):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time += elapsed
+            self.max_wait = max(self.max_wait, elapsed)
+
+    def record_connect(self, elapsed):
+        with self._lock:
+            self.connects += 1
+            self.connect_time += elapsed
+            self.max_connect = max(self.max_connect, elapsed)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited and each connect took.
+
+    Checkout wait includes the time spent opening a new connection when the
+    pool had none idle, which is exactly the cost a request sees.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.metrics = kwargs.pop("metrics", None) or PoolMetrics()
+        super().__init__(*args, **kwargs)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            self.metrics.record_connect(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def snapshot(engine):
+    """Return the current pool gauges and totals for an engine."""
+    pool = engine.pool
+    stats = {
+        "pool_class": type(pool).__name__,
+        "status": pool.status(),
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update({
+            "checkouts": metrics.checkouts,
+            "avg_wait_ms": metrics.wait_time * 1000 / metrics.checkouts if metrics.checkouts else 0.0,
+            "max_wait_ms": metrics.max_wait * 1000,
+            "connects": metrics.connects,
+            "avg_connect_ms": metrics.connect_time * 1000 / metrics.connects if metrics.connects else 0.0,
+            "max_connect_ms": metrics.max_connect * 1000,
+        })
+    return stats
+
+
+def warm_up(engine, count, timeout=WARMUP_TIMEOUT):
+    """Open up to `count` connections concurrently and return them to the pool.
+
+    The count is capped at the pool size, since overflow connections are
+    closed as soon as they are returned. Failures are logged rather than
+    raised, as the pool opens connections on demand anyway; returns how many
+    connections were opened.
+    """
+    if isinstance(engine.pool, QueuePool):
+        count = min(count, engine.pool.size())
+    if count <= 0:
+        return 0
+    barrier = threading.Barrier(count)
+    opened = set()
+
+    def hold():
+        try:
+            connection = engine.connect()
+        except Exception:
+            # Release the threads already waiting for this one
+            barrier.abort()
+            logger.exception("Failed to open a connection during pool warm-up")
+            return
+        with connection:
+            # After an abort a connection may be handed out twice; count it once
+            opened.add(id(connection.connection.dbapi_connection))
+            # Keep every connection checked out until all are open,
+            # otherwise the pool would hand the same one out again
+            try:
+                barrier.wait(timeout)
+            except threading.BrokenBarrierError:
+                pass
+
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        for future in [executor.submit(hold) for _ in range(count)]:
+            future.result()
+    if len(opened) < count:
+        logger.warning("Pool warm-up opened %d of %d connections", len(opened), count)
+    return len(opened)
+
+
+def reset_metrics(engine):
+    """Discard the collected pool totals for an engine."""
+    if isinstance(getattr(engine.pool, "metrics", None), PoolMetrics):
+        engine.pool.metrics = PoolMetrics()
@@ -0,0 +1,89 @@
+"""Streaming export of a subject's flashcards.
+
+Cards are read through a server-side cursor and written out as they arrive,
+so an export never holds a whole deck in memory.
+
+The binary deck bundle ("deck" format) is the magic bytes ``FCDK``, a format
+version byte, then a zlib stream of records. Each record is a question and
+an answer, each encoded as a little-endian uint32 byte length followed by
+UTF-8 text.
+"""
+import csv
+import io
+import json
+import struct
+import zlib
+
+from models import db, Flashcard
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+    'deck': 'application/octet-stream',
+}
+
+BUNDLE_MAGIC = b'FCDK'
+BUNDLE_VERSION = 1
+YIELD_PER = 1000
+
+_length = struct.Struct('<I')
+
+
+def iter_cards(subject_id):
+    """Yield (id, question, answer) rows for a subject using a server-side cursor."""
+    result = db.session.execute(
+        db.select(Flashcard.id, Flashcard.question, Flashcard.answer)
+        .filter_by(subject_id=subject_id)
+        .order_by(Flashcard.id)
+        .execution_options(yield_per=YIELD_PER)
+    )
+    for partition in result.partitions():
+        yield from partition
+
+
+def etag(subject, fmt):
+    """Return the strong ETag for an export of a subject at its current version."""
+    return f"subject-{subject.id}-{subject.token}-v{subject.version}-{fmt}"
+
+
+def export_csv(subject_id):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['question', 'answer'])
+    for n, (_, question, answer) in enumerate(iter_cards(subject_id), 1):
+        writer.writerow([question, answer])
+        if n % YIELD_PER == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_jsonl(subject_id):
+    lines = []
+    for card_id, question, answer in iter_cards(subject_id):
+        lines.append(json.dumps({"id": card_id, "question": question, "answer": answer},
+                                ensure_ascii=False) + "\n")
+        if len(lines) >= YIELD_PER:
+            yield "".join(lines)
+            lines.clear()
+    yield "".join(lines)
+
+
+def export_deck(subject_id):
+    yield BUNDLE_MAGIC + bytes([BUNDLE_VERSION])
+    compressor = zlib.compressobj()
+    for _, question, answer in iter_cards(subject_id):
+        for text in (question, answer):
+            data = text.encode('utf-8')
+            chunk = compressor.compress(_length.pack(len(data)) + data)
+            if chunk:
+                yield chunk
+    yield compressor.flush()
+
+
+EXPORTERS = {
+    'csv': export_csv,
+    'jsonl': export_jsonl,
+    'deck': export_deck,
+}
@@ -0,0 +1,208 @@
+"""Set-based deletion of subjects and users.
+
+Rows are removed with DELETE ... WHERE ... IN (...) statements in foreign
+key order, without loading them into the session. When a deletion would
+remove more than BACKGROUND_THRESHOLD cards, the cards and their review
+states are deleted by a background thread in committed chunks of
+CHUNK_SIZE, reporting progress through a DeletionJob. The remaining rows
+(the subjects, purchases, memberships, the user...) are then removed
+together in one final transaction. Chunks already committed stay deleted
+if a job fails, leaving the subject or user in place with part of its
+cards gone, so each chunk bumps the versions of the subjects it touched in
+the same transaction; the job can simply be started again to finish.
+"""
+from collections import OrderedDict
+import itertools
+import logging
+import threading
+import time
+
+from flask import current_app
+
+from models import (db, User, Flashcard, Subject, Purchase, Classroom, ClassMembership,
+                    ReviewState, SubjectProgress, ClassProgress)
+import card_selection
+import entitlements
+import fragment_cache
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 5000
+BACKGROUND_THRESHOLD = 20000
+MAX_JOBS = 50
+
+_jobs = OrderedDict()
+_lock = threading.Lock()
+_job_ids = itertools.count(1)
+
+
+class DeletionJob:
+    """Progress of a background deletion."""
+
+    def __init__(self, key, description, total):
+        self.id = next(_job_ids)
+        self.key = key
+        self.description = description
+        self.total = total
+        self.done = 0
+        self.status = "running"
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "description": self.description,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "error": self.error,
+            "seconds": (self.finished_at or time.time()) - self.started_at,
+        }
+
+
+def jobs():
+    """Return the recent background deletions, newest first."""
+    with _lock:
+        return list(reversed(_jobs.values()))
+
+
+def _delete_card_rows(card_filter):
+    """Delete the cards matching a filter, and their review states."""
+    card_ids = db.select(Flashcard.id).filter(card_filter)
+    db.session.execute(db.delete(ReviewState).where(ReviewState.card_id.in_(card_ids)))
+    db.session.execute(db.delete(Flashcard).where(card_filter))
+
+
+def _delete_subject_rows(subject_ids):
+    _delete_card_rows(Flashcard.subject_id.in_(subject_ids))
+    db.session.execute(db.delete(ReviewState).where(ReviewState.subject_id.in_(subject_ids)))
+    db.session.execute(db.delete(SubjectProgress).where(SubjectProgress.subject_id.in_(subject_ids)))
+    db.session.execute(db.delete(Purchase).where(Purchase.subject_id.in_(subject_ids)))
+    db.session.execute(db.delete(Subject).where(Subject.id.in_(subject_ids)))
+
+
+def _delete_user_rows(user_id, subject_ids, classroom_ids):
+    if subject_ids:
+        _delete_subject_rows(subject_ids)
+    # Cards the user added to other people's subjects
+    _delete_card_rows(Flashcard.user_id == user_id)
+
+    for model in (ReviewState, SubjectProgress, ClassProgress, Purchase, ClassMembership):
+        db.session.execute(db.delete(model).where(model.user_id == user_id))
+
+    if classroom_ids:
+        db.session.execute(db.delete(ClassMembership).where(ClassMembership.classroom_id.in_(classroom_ids)))
+        db.session.execute(db.delete(ClassProgress).where(ClassProgress.classroom_id.in_(classroom_ids)))
+        # Other owners' subjects attached to the classroom survive, detached
+        db.session.execute(db.update(Subject).where(Subject.classroom_id.in_(classroom_ids))
+                           .values(classroom_id=None))
+        db.session.execute(db.delete(Classroom).where(Classroom.id.in_(classroom_ids)))
+    db.session.execute(db.delete(User).where(User.id == user_id))
+
+
+def _run(key, description, card_filter, finish, invalidate):
+    """Delete inline, or start a background job when there are many cards."""
+    total = db.session.scalar(db.select(db.func.count(Flashcard.id)).filter(card_filter))
+    if total <= BACKGROUND_THRESHOLD:
+        finish()
+        db.session.commit()
+        invalidate()
+        return None
+
+    with _lock:
+        for job in _jobs.values():
+            if job.key == key and job.status == "running":
+                return job
+        job = DeletionJob(key, description, total)
+        _jobs[job.id] = job
+        while len(_jobs) > MAX_JOBS:
+            _jobs.popitem(last=False)
+
+    app = current_app._get_current_object()
+    thread = threading.Thread(target=_run_job, args=(app, job, card_filter, finish, invalidate),
+                              name=f"deletion-{job.id}", daemon=True)
+    thread.start()
+    return job
+
+
+def _run_job(app, job, card_filter, finish, invalidate):
+    with app.app_context():
+        try:
+            while True:
+                chunk = db.session.execute(
+                    db.select(Flashcard.id, Flashcard.subject_id)
+                    .filter(card_filter).order_by(Flashcard.id).limit(CHUNK_SIZE)).all()
+                if not chunk:
+                    break
+                _delete_card_rows(Flashcard.id.in_([card_id for card_id, _ in chunk]))
+                for subject_id in {subject_id for _, subject_id in chunk}:
+                    Subject.bump_version(subject_id)
+                db.session.commit()
+                job.done += len(chunk)
+            finish()
+            db.session.commit()
+            invalidate()
+            job.status = "done"
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Deletion job %s failed", job.id)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+
+
+def delete_subject(subject_id):
+    """Delete a subject and everything that depends on it.
+
+    Returns None when the deletion is complete, or the DeletionJob that is
+    finishing it in the background.
+    """
+    subject_ids = [subject_id]
+
+    def invalidate():
+        card_selection.invalidate(subject_id)
+        entitlements.invalidate_subject(subject_id)
+        fragment_cache.invalidate_subject(subject_id)
+
+    name = db.session.scalar(db.select(Subject.name).filter_by(id=subject_id))
+    return _run(("subject", subject_id), f"Subject '{name}'",
+                Flashcard.subject_id == subject_id,
+                lambda: _delete_subject_rows(subject_ids), invalidate)
+
+
+def delete_user(user_id):
+    """Delete a user with their subjects, classrooms, purchases and study history.
+
+    Returns None when the deletion is complete, or the DeletionJob that is
+    finishing it in the background.
+    """
+    subject_ids = list(db.session.scalars(db.select(Subject.id).filter_by(user_id=user_id)))
+    classroom_ids = list(db.session.scalars(db.select(Classroom.id).filter_by(teacher_id=user_id)))
+    member_ids = list(db.session.scalars(
+        db.select(ClassMembership.user_id).filter(ClassMembership.classroom_id.in_(classroom_ids))
+    )) if classroom_ids else []
+    # Other people's subjects the user added cards to lose those cards
+    changed_ids = list(db.session.scalars(
+        db.select(Flashcard.subject_id).distinct()
+        .filter(Flashcard.user_id == user_id, Flashcard.subject_id.notin_(subject_ids))
+    ))
+
+    def finish():
+        _delete_user_rows(user_id, subject_ids, classroom_ids)
+        for subject_id in changed_ids:
+            Subject.bump_version(subject_id)
+
+    def invalidate():
+        for subject_id in subject_ids + changed_ids:
+            card_selection.invalidate(subject_id)
+            entitlements.invalidate_subject(subject_id)
+            fragment_cache.invalidate_subject(subject_id)
+        for member_id in [user_id, *member_ids]:
+            entitlements.invalidate_user(member_id)
+
+    card_filter = db.or_(Flashcard.user_id == user_id, Flashcard.subject_id.in_(subject_ids))
+    username = db.session.scalar(db.select(User.username).filter_by(id=user_id))
+    return _run(("user", user_id), f"User {username}", card_filter, finish, invalidate)
@@ -0,0 +1,127 @@
+"""Bulk enrollment of students into a classroom.
+
+A roster is resolved with one IN query for the users and one for the
+existing memberships, and the new memberships are inserted in one batch, so
+enrolling a whole course costs the same handful of queries as enrolling one
+student. Rosters are capped at MAX_ROSTER emails to keep requests bounded.
+"""
+import csv
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, ClassMembership
+import entitlements
+
+MAX_ROSTER = 5000
+
+
+class InvalidRoster(ValueError):
+    pass
+
+
+class RosterTooLarge(InvalidRoster):
+    pass
+
+
+class EnrollmentResult:
+    """Outcome of a bulk enrollment."""
+
+    def __init__(self):
+        self.enrolled = []
+        self.already_enrolled = []
+        self.missing = []
+        self.duplicates = []
+
+    def as_dict(self):
+        return {
+            "enrolled": self.enrolled,
+            "already_enrolled": self.already_enrolled,
+            "missing": self.missing,
+            "duplicates": self.duplicates,
+        }
+
+
+def read_roster(stream):
+    """Read the emails from a CSV roster.
+
+    Uses the "email" column when the first row is a header containing one,
+    otherwise the first column. Blank cells are skipped. Raises
+    InvalidRoster when the file cannot be parsed.
+    """
+    rows = csv.reader(stream)
+    column = 0
+    emails = []
+    try:
+        for n, row in enumerate(rows):
+            if n == 0:
+                header = [cell.strip().lower() for cell in row]
+                if "email" in header:
+                    column = header.index("email")
+                    continue
+            if column < len(row) and row[column].strip():
+                emails.append(row[column].strip())
+                if len(emails) > MAX_ROSTER:
+                    raise RosterTooLarge(f"Rosters are limited to {MAX_ROSTER} emails.")
+    except csv.Error as e:
+        raise InvalidRoster(f"Could not read line {rows.line_num} of the roster: {e}") from e
+    return emails
+
+
+def enroll(classroom_id, emails):
+    """Enroll the users with the given emails, skipping existing members."""
+    if len(emails) > MAX_ROSTER:
+        raise RosterTooLarge(f"Rosters are limited to {MAX_ROSTER} emails.")
+
+    result = EnrollmentResult()
+    unique, seen = [], set()
+    for email in emails:
+        email = email.strip()
+        if not email:
+            continue
+        if email.lower() in seen:
+            result.duplicates.append(email)
+        else:
+            seen.add(email.lower())
+            unique.append(email)
+    if not unique:
+        return result
+
+    # Emails are matched case-insensitively, like the duplicate check above;
+    # an exact match wins if two accounts differ only in case
+    exact = set(unique)
+    users = {}
+    for email, user_id in db.session.execute(
+        db.select(User.email, User.id).filter(db.func.lower(User.email).in_(seen))
+    ):
+        if email.lower() not in users or email in exact:
+            users[email.lower()] = user_id
+    users = {email: users[email.lower()] for email in unique if email.lower() in users}
+    result.missing = [email for email in unique if email not in users]
+
+    for attempt in range(2):
+        members = set(db.session.scalars(
+            db.select(ClassMembership.user_id).filter(
+                ClassMembership.classroom_id == classroom_id,
+                ClassMembership.user_id.in_(users.values()),
+            )
+        ))
+        new = [(email, users[email]) for email in unique
+               if email in users and users[email] not in members]
+        if not new:
+            break
+        try:
+            db.session.execute(db.insert(ClassMembership),
+                               [{"user_id": user_id, "classroom_id": classroom_id} for _, user_id in new])
+            db.session.commit()
+            break
+        except IntegrityError:
+            # Someone enrolled one of these students concurrently; look again
+            db.session.rollback()
+            if attempt:
+                raise
+
+    result.enrolled = [email for email, _ in new]
+    result.already_enrolled = [email for email in unique if email in users and users[email] in members]
+    for _, user_id in new:
+        entitlements.invalidate_user(user_id)
+    return result
@@ -0,0 +1,121 @@
+"""Decides who may study or manage a subject.
+
+Study access is answered by a single EXISTS query and cached per user with
+a TTL and LRU eviction. Callers invalidate the cache when access changes
+(a student joins a class, a purchase is made, a subject changes visibility);
+the TTL bounds how long other worker processes can serve a stale answer.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+from sqlalchemy import event
+
+from models import db, Subject, Purchase, Classroom, ClassMembership
+
+CACHE_TTL = 60
+MAX_CACHED_USERS = 10000
+
+_cache = OrderedDict()  # user_id -> {subject_id: (expires_at, allowed)}
+_lock = threading.Lock()
+
+
+def _study_access_query(user_id, subject_id):
+    """Owner OR Public OR Class Teacher/Member OR Purchased, as one EXISTS query."""
+    in_class = db.or_(
+        db.select(Classroom.id)
+        .filter(Classroom.id == Subject.classroom_id, Classroom.teacher_id == user_id)
+        .exists(),
+        db.select(ClassMembership.id)
+        .filter(ClassMembership.classroom_id == Subject.classroom_id, ClassMembership.user_id == user_id)
+        .exists(),
+    )
+    purchased = db.select(Purchase.id).filter(
+        Purchase.subject_id == Subject.id, Purchase.user_id == user_id
+    ).exists()
+
+    return db.select(
+        db.select(Subject.id)
+        .filter(
+            Subject.id == subject_id,
+            db.or_(
+                Subject.is_public.is_(True),
+                Subject.user_id == user_id,
+                db.and_(Subject.classroom_id.is_not(None), in_class),
+                db.and_(Subject.classroom_id.is_(None), purchased),
+            ),
+        )
+        .exists()
+    )
+
+
+def _cached(user_id, subject_id):
+    with _lock:
+        entries = _cache.get(user_id)
+        if entries is None:
+            return None
+        _cache.move_to_end(user_id)
+        entry = entries.get(subject_id)
+    if entry is None or entry[0] < time.monotonic():
+        return None
+    return entry[1]
+
+
+def _store(user_id, subject_id, allowed):
+    with _lock:
+        entries = _cache.setdefault(user_id, {})
+        entries[subject_id] = (time.monotonic() + CACHE_TTL, allowed)
+        _cache.move_to_end(user_id)
+        while len(_cache) > MAX_CACHED_USERS:
+            _cache.popitem(last=False)
+
+
+def can_study(user, subject):
+    """Check whether a user (possibly anonymous) may study a subject."""
+    if subject.is_public:
+        return True
+    if not user.is_authenticated:
+        return False
+    if subject.user_id == user.id:
+        return True
+
+    allowed = _cached(user.id, subject.id)
+    if allowed is None:
+        allowed = bool(db.session.scalar(_study_access_query(user.id, subject.id)))
+        _store(user.id, subject.id, allowed)
+    return allowed
+
+
+def can_manage(user, subject):
+    """Check whether a user may view and edit a subject's cards."""
+    return user.is_authenticated and (subject.user_id == user.id or user.role == 'admin')
+
+
+def is_class_member(user_id, classroom_id):
+    """Check class membership without loading the roster."""
+    return bool(db.session.scalar(
+        db.select(
+            db.select(ClassMembership.id)
+            .filter_by(user_id=user_id, classroom_id=classroom_id)
+            .exists()
+        )
+    ))
+
+
+def invalidate_user(user_id):
+    """Forget every cached decision for a user."""
+    with _lock:
+        _cache.pop(user_id, None)
+
+
+def invalidate_subject(subject_id):
+    """Forget every cached decision about a subject."""
+    with _lock:
+        for entries in _cache.values():
+            entries.pop(subject_id, None)
+
+
+@event.listens_for(Purchase, "after_insert")
+@event.listens_for(Purchase, "after_delete")
+def _purchase_changed(mapper, connection, target):
+    invalidate_user(target.user_id)
@@ -0,0 +1,209 @@
+"""Cache of rendered HTML fragments for subject pages.
+
+Fragments are keyed by (fragment name, subject id, subject version, viewer
+role). Every change to a subject's cards bumps its version, so a stale
+fragment can never be served, even by another worker; invalidate_subject()
+only frees the entries early. Fragments are kept in an in-process LRU
+capped at FRAGMENT_CACHE_MAX_BYTES, optionally backed by a shared store
+chosen with the FRAGMENT_CACHE_BACKEND config key (or environment variable):
+
+    memory      in-process only (the default)
+    file        files in FRAGMENT_CACHE_DIR, shared by the workers on a host;
+                writing a subject's fragment removes its older versions
+    none        caching disabled
+"""
+from collections import OrderedDict
+import glob
+import os
+import tempfile
+import threading
+
+from markupsafe import Markup
+
+BACKENDS = ("memory", "file", "none")
+MAX_BYTES = 32 * 1024 * 1024
+
+
+class FileStore:
+    """Fragments as files in a directory shared by every worker on a host."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        name, subject_id, version, role = key
+        return os.path.join(self.directory, f"{subject_id}-{version}-{name}-{role}.html")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, html):
+        # Write to a temporary file first so readers never see a partial fragment
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(tmp, self._path(key))
+        # Fragments of older versions can never be read again
+        self.delete_subject(key[1], before_version=key[2])
+
+    def delete_subject(self, subject_id, before_version=None):
+        for path in glob.glob(os.path.join(self.directory, f"{subject_id}-*.html")):
+            version = os.path.basename(path).split("-")[1]
+            if before_version is not None and not (version.isdigit() and int(version) < before_version):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class FragmentCache:
+    """LRU of rendered fragments capped at max_bytes, in front of an optional shared store."""
+
+    def __init__(self, max_bytes=MAX_BYTES, store=None, enabled=True):
+        self.max_bytes = max_bytes
+        self.store = store
+        self.enabled = enabled
+        self._data = OrderedDict()  # key -> (html, size)
+        self._by_subject = {}  # subject_id -> keys
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.shared_hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def _remove(self, key):
+        _, size = self._data.pop(key)
+        self.bytes -= size
+        keys = self._by_subject[key[1]]
+        keys.discard(key)
+        if not keys:
+            del self._by_subject[key[1]]
+
+    def _put(self, key, html):
+        size = len(html.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (html, size)
+            self._by_subject.setdefault(key[1], set()).add(key)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def get(self, key):
+        """Return the cached fragment for a key, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return Markup(entry[0])
+        html = self.store.get(key) if self.store is not None else None
+        with self._lock:
+            if html is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.shared_hits += 1
+        self._put(key, html)
+        return Markup(html)
+
+    def set(self, key, html):
+        """Cache a rendered fragment, returning it as Markup."""
+        html = str(html)
+        if self.enabled:
+            self._put(key, html)
+            if self.store is not None:
+                self.store.set(key, html)
+        return Markup(html)
+
+    def invalidate_subject(self, subject_id):
+        """Drop every cached fragment of a subject."""
+        with self._lock:
+            for key in list(self._by_subject.get(subject_id, ())):
+                self._remove(key)
+        if self.store is not None:
+            self.store.delete_subject(subject_id)
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "none" if not self.enabled else "file" if self.store is not None else "memory",
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+cache = FragmentCache()
+
+
+def key(name, subject, role):
+    """Cache key for a fragment of a subject as seen by a viewer role."""
+    return (name, subject.id, subject.version, role)
+
+
+def make_cache(backend, config):
+    """Build the fragment cache for a backend name."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown fragment cache backend: {backend}")
+    store = None
+    if backend == "file":
+        store = FileStore(config.get("FRAGMENT_CACHE_DIR")
+                          or os.path.join(tempfile.gettempdir(), "flashcards-fragments"))
+    return FragmentCache(int(config.get("FRAGMENT_CACHE_MAX_BYTES", MAX_BYTES)), store,
+                         enabled=backend != "none")
+
+
+def init_app(app):
+    """Configure the module-level cache from the app config."""
+    global cache
+    for name in ("FRAGMENT_CACHE_BACKEND", "FRAGMENT_CACHE_DIR", "FRAGMENT_CACHE_MAX_BYTES"):
+        if name in os.environ:
+            app.config.setdefault(name, os.environ[name])
+    cache = make_cache(app.config.setdefault("FRAGMENT_CACHE_BACKEND", "memory"), app.config)
+
+
+def lookup(name, subject, role):
+    return cache.get(key(name, subject, role))
+
+
+def store(name, subject, role, html):
+    return cache.set(key(name, subject, role), html)
+
+
+def invalidate_subject(subject_id):
+    cache.invalidate_subject(subject_id)
+
+
+def snapshot():
+    return cache.snapshot()
+
+
+def reset_stats():
+    cache.reset_stats()
@@ -0,0 +1,17 @@
+"""Gunicorn settings: gunicorn 'app:create_app()'
+
+The app is loaded once in the master and forked into the workers, so they
+share its imported modules and compiled templates. Database connections
+and the Cloud SQL connector are only opened after the fork, in each worker.
+"""
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+preload_app = True
+
+
+def post_fork(server, worker):
+    import app
+
+    app.warm_up_pool(worker.app.wsgi())
@@ -0,0 +1,72 @@
+"""Keyset (seek) pagination helpers.
+
+A page is fetched by seeking past the sort key of the last row already
+shown, so every page costs one index range scan no matter how deep it is.
+"""
+import base64
+import json
+import math
+
+from sqlalchemy import tuple_
+
+MAX_INT = 2**63 - 1
+
+
+def encode_cursor(values):
+    """Encode a list of JSON-serializable sort key values as a URL-safe cursor."""
+    raw = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _valid_value(value, python_type):
+    """Check that a decoded cursor value has the type of its sort key."""
+    if python_type is int:
+        return type(value) is int and -MAX_INT <= value <= MAX_INT
+    if python_type is float:
+        return type(value) in (int, float) and math.isfinite(value)
+    return type(value) is python_type
+
+
+def decode_cursor(cursor, types):
+    """Decode a cursor into one value per sort key type, or return None if it is invalid.
+
+    Cursors come from the query string, so every value is checked against
+    the Python type of its sort key before it reaches SQL.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != len(types):
+        return None
+    if not all(_valid_value(value, python_type) for value, python_type in zip(values, types)):
+        return None
+    return values
+
+
+def paginate(query, sort_column, id_column, after=None, descending=False, per_page=50):
+    """Return one page of `query` ordered by (sort_column, id_column) and the next cursor.
+
+    `sort_column` may be the same as `id_column` to sort by id alone. The
+    next cursor is None on the last page.
+    """
+    keys = [id_column] if sort_column is id_column else [sort_column, id_column]
+
+    values = decode_cursor(after, [key.type.python_type for key in keys]) if after else None
+    if values is not None:
+        if len(keys) == 1:
+            position, bound = keys[0], values[0]
+        else:
+            position, bound = tuple_(*keys), tuple_(*values)
+        query = query.filter(position < bound if descending else position > bound)
+
+    query = query.order_by(*[key.desc() if descending else key.asc() for key in keys])
+    rows = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, key.key) for key in keys])
+    return rows, next_cursor
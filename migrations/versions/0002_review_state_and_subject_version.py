@@ -0,0 +1,58 @@
+"""Add review state and subject version columns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('review_state'):
+        op.create_table(
+            'review_state',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('card_id', sa.Integer(), nullable=False),
+            sa.Column('subject_id', sa.Integer(), nullable=False),
+            sa.Column('ease', sa.Float(), nullable=False),
+            sa.Column('interval', sa.Float(), nullable=False),
+            sa.Column('repetitions', sa.Integer(), nullable=False),
+            sa.Column('lapses', sa.Integer(), nullable=False),
+            sa.Column('due_at', sa.DateTime(), nullable=False),
+            sa.Column('last_reviewed_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['card_id'], ['flashcard.id']),
+            sa.ForeignKeyConstraint(['subject_id'], ['subject.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'card_id', name='uq_review_state_user_card'),
+        )
+        op.create_index('ix_review_state_due', 'review_state', ['user_id', 'subject_id', 'due_at'])
+
+    columns = {c['name'] for c in inspector.get_columns('subject')}
+    # SQLite cannot ALTER TABLE ADD COLUMN with a CURRENT_TIMESTAMP default, so rebuild it there
+    with op.batch_alter_table('subject', recreate='always' if op.get_bind().dialect.name == 'sqlite' else 'auto') as batch_op:
+        if 'version' not in columns:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+        if 'updated_at' not in columns:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True,
+                                          server_default=sa.func.now()))
+
+
+def downgrade():
+    with op.batch_alter_table('subject') as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('version')
+    op.drop_index('ix_review_state_due', table_name='review_state')
+    op.drop_table('review_state')
@@ -0,0 +1,84 @@
+"""Add full-text search index
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# The index as this revision creates it. Kept here rather than imported from
+# search.py, so later changes to the app do not change what 0003 does.
+SQLITE_SETUP = [
+    """CREATE VIRTUAL TABLE card_search USING fts5(
+        question, answer, subject_id UNINDEXED, tokenize='unicode61')""",
+    """CREATE VIRTUAL TABLE subject_search USING fts5(name, tokenize='unicode61')""",
+    """INSERT INTO card_search(rowid, question, answer, subject_id)
+        SELECT id, question, answer, subject_id FROM flashcard""",
+    """INSERT INTO subject_search(rowid, name) SELECT id, name FROM subject""",
+    """CREATE TRIGGER card_search_insert AFTER INSERT ON flashcard BEGIN
+        INSERT INTO card_search(rowid, question, answer, subject_id)
+        VALUES (new.id, new.question, new.answer, new.subject_id);
+    END""",
+    """CREATE TRIGGER card_search_delete AFTER DELETE ON flashcard BEGIN
+        DELETE FROM card_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER card_search_update AFTER UPDATE OF question, answer, subject_id ON flashcard BEGIN
+        UPDATE card_search SET question = new.question, answer = new.answer, subject_id = new.subject_id
+        WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER subject_search_insert AFTER INSERT ON subject BEGIN
+        INSERT INTO subject_search(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER subject_search_delete AFTER DELETE ON subject BEGIN
+        DELETE FROM subject_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER subject_search_update AFTER UPDATE OF name ON subject BEGIN
+        UPDATE subject_search SET name = new.name WHERE rowid = old.id;
+    END""",
+]
+
+POSTGRES_SETUP = [
+    """ALTER TABLE flashcard ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', question || ' ' || answer)) STORED""",
+    """CREATE INDEX IF NOT EXISTS ix_flashcard_search_vector ON flashcard USING GIN (search_vector)""",
+    """ALTER TABLE subject ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', name)) STORED""",
+    """CREATE INDEX IF NOT EXISTS ix_subject_search_vector ON subject USING GIN (search_vector)""",
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        statements = POSTGRES_SETUP
+    elif sa.inspect(bind).has_table('card_search'):
+        return
+    else:
+        statements = SQLITE_SETUP
+
+    for statement in statements:
+        op.execute(sa.text(statement))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_subject_search_vector', table_name='subject')
+        op.drop_column('subject', 'search_vector')
+        op.drop_index('ix_flashcard_search_vector', table_name='flashcard')
+        op.drop_column('flashcard', 'search_vector')
+        return
+
+    for trigger in ('card_search_insert', 'card_search_delete', 'card_search_update',
+                    'subject_search_insert', 'subject_search_delete', 'subject_search_update'):
+        op.execute(sa.text(f'DROP TRIGGER IF EXISTS {trigger}'))
+    op.execute(sa.text('DROP TABLE IF EXISTS card_search'))
+    op.execute(sa.text('DROP TABLE IF EXISTS subject_search'))
@@ -0,0 +1,56 @@
+"""Add indexes for hot lookups
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+On PostgreSQL the indexes are built CONCURRENTLY so that a live database
+keeps serving reads and writes while they are created.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_flashcard_subject_id_id', 'flashcard', ['subject_id', 'id'], False),
+    ('ix_flashcard_user_id', 'flashcard', ['user_id'], False),
+    ('ix_subject_user_id', 'subject', ['user_id'], False),
+    ('ix_subject_classroom_id', 'subject', ['classroom_id'], False),
+    ('uq_purchase_user_subject', 'purchase', ['user_id', 'subject_id'], True),
+    ('ix_purchase_subject_id', 'purchase', ['subject_id'], False),
+    ('ix_classroom_teacher_id', 'classroom', ['teacher_id'], False),
+    ('uq_class_membership_user_classroom', 'class_membership', ['user_id', 'classroom_id'], True),
+    ('ix_class_membership_classroom_id', 'class_membership', ['classroom_id'], False),
+]
+
+
+def upgrade():
+    # Drop duplicate rows so the unique indexes can be built, keeping the oldest
+    op.execute(sa.text(
+        'DELETE FROM purchase WHERE id NOT IN '
+        '(SELECT MIN(id) FROM purchase GROUP BY user_id, subject_id)'
+    ))
+    op.execute(sa.text(
+        'DELETE FROM class_membership WHERE id NOT IN '
+        '(SELECT MIN(id) FROM class_membership GROUP BY user_id, classroom_id)'
+    ))
+
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, columns, unique in INDEXES:
+                op.create_index(name, table, columns, unique=unique,
+                                postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
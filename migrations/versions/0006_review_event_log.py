@@ -0,0 +1,37 @@
+"""Add review event log
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'review_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('subject_id', sa.Integer(), nullable=False),
+        sa.Column('card_id', sa.Integer(), nullable=False),
+        sa.Column('action', sa.String(length=10), nullable=False),
+        sa.Column('grade', sa.String(length=10), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_review_event_user_subject_created', 'review_event',
+                    ['user_id', 'subject_id', 'created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_review_event_user_subject_created', table_name='review_event')
+    op.drop_table('review_event')
@@ -0,0 +1,54 @@
+"""Add study progress rollups
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'subject_progress',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('subject_id', sa.Integer(), nullable=False),
+        sa.Column('cards_seen', sa.Integer(), nullable=False),
+        sa.Column('reviews', sa.Integer(), nullable=False),
+        sa.Column('correct', sa.Integer(), nullable=False),
+        sa.Column('streak', sa.Integer(), nullable=False),
+        sa.Column('last_studied_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['subject_id'], ['subject.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'subject_id', name='uq_subject_progress_user_subject'),
+    )
+    op.create_table(
+        'class_progress',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('classroom_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('cards_seen', sa.Integer(), nullable=False),
+        sa.Column('reviews', sa.Integer(), nullable=False),
+        sa.Column('correct', sa.Integer(), nullable=False),
+        sa.Column('streak', sa.Integer(), nullable=False),
+        sa.Column('last_studied_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['classroom_id'], ['classroom.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('classroom_id', 'user_id', name='uq_class_progress_classroom_user'),
+    )
+
+
+def downgrade():
+    op.drop_table('class_progress')
+    op.drop_table('subject_progress')
@@ -0,0 +1,32 @@
+"""Add server-side session table
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'server_session',
+        sa.Column('id', sa.String(length=64), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_server_session_expires_at', 'server_session', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_server_session_expires_at', table_name='server_session')
+    op.drop_table('server_session')
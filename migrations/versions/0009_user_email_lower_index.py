@@ -0,0 +1,24 @@
+"""Add a case-insensitive email index
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_email_lower', 'user', [sa.text('lower(email)')])
+
+
+def downgrade():
+    op.drop_index('ix_user_email_lower', table_name='user')
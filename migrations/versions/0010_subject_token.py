@@ -0,0 +1,25 @@
+"""Add a random token to subjects for export ETags
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A plain ADD COLUMN: rebuilding the table on SQLite would drop the search triggers
+    op.add_column('subject', sa.Column('token', sa.String(length=16), nullable=False, server_default=''))
+
+
+def downgrade():
+    op.drop_column('subject', 'token')
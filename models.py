@@ -1,6 +1,8 @@
+import secrets
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+import passwords
 
 db = SQLAlchemy()
 
@@ -12,13 +14,22 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(10), nullable=False, default='student')
 
+    __table_args__ = (
+        db.Index('ix_user_role_id', 'role', 'id'),
+        db.Index('ix_user_email_lower', db.func.lower(email)),
+    )
+
     def set_password(self, password):
         """Hash and set the user's password."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
 
     def check_password(self, password):
         """Check if the provided password matches the hash."""
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Check whether the stored hash uses outdated hashing parameters."""
+        return passwords.needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -33,6 +44,11 @@ class Flashcard(db.Model):
     
     user = db.relationship('User', backref=db.backref('flashcards', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_flashcard_subject_id_id', 'subject_id', 'id'),
+        db.Index('ix_flashcard_user_id', 'user_id'),
+    )
+
     def __repr__(self):
         return f'<Flashcard {self.question[:20]}...>'
 
@@ -49,6 +65,27 @@ class Subject(db.Model):
     flashcards = db.relationship('Flashcard', backref='subject', lazy=True, cascade="all, delete-orphan")
     price = db.Column(db.Float, default=0.0)
     is_for_sale = db.Column(db.Boolean, default=False)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, server_default=db.func.now())
+    # Random per row, so export ETags are not repeated when a deleted subject's id is reused
+    token = db.Column(db.String(16), nullable=False, default=lambda: secrets.token_hex(8),
+                      server_default='')
+
+    __table_args__ = (
+        db.Index('ix_subject_user_id', 'user_id'),
+        db.Index('ix_subject_classroom_id', 'classroom_id'),
+        db.Index('ix_subject_name_id', 'name', 'id'),
+        db.Index('ix_subject_is_for_sale_id', 'is_for_sale', 'id'),
+    )
+
+    @classmethod
+    def bump_version(cls, subject_id):
+        """Mark a subject's cards as changed. Takes effect when the session commits."""
+        db.session.execute(
+            db.update(cls)
+            .where(cls.id == subject_id)
+            .values(version=cls.version + 1, updated_at=db.func.now())
+        )
 
     def __repr__(self):
         return f'<Subject {self.name}>'
@@ -63,6 +100,11 @@ class Purchase(db.Model):
     user = db.relationship('User', backref=db.backref('purchases', lazy=True))
     subject = db.relationship('Subject', backref=db.backref('purchases', lazy=True))
 
+    __table_args__ = (
+        db.Index('uq_purchase_user_subject', 'user_id', 'subject_id', unique=True),
+        db.Index('ix_purchase_subject_id', 'subject_id'),
+    )
+
 class Classroom(db.Model):
     """Classroom model for teachers."""
     id = db.Column(db.Integer, primary_key=True)
@@ -72,6 +114,10 @@ class Classroom(db.Model):
     teacher = db.relationship('User', backref=db.backref('classrooms', lazy=True))
     students = db.relationship('User', secondary='class_membership', backref=db.backref('enrolled_classes', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_classroom_teacher_id', 'teacher_id'),
+    )
+
     def __repr__(self):
         return f'<Classroom {self.name}>'
 
@@ -81,8 +127,109 @@ class ClassMembership(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     classroom_id = db.Column(db.Integer, db.ForeignKey('classroom.id'), nullable=False)
 
+    __table_args__ = (
+        db.Index('uq_class_membership_user_classroom', 'user_id', 'classroom_id', unique=True),
+        db.Index('ix_class_membership_classroom_id', 'classroom_id'),
+    )
+
     def __repr__(self):
         # Assuming 'name' refers to the classroom name for a meaningful representation
         # This would require accessing the related classroom object.
         # For simplicity, let's represent by IDs for now.
         return f'<ClassMembership User:{self.user_id} Class:{self.classroom_id}>'
+
+class ReviewState(db.Model):
+    """Spaced-repetition state of one card for one user."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    card_id = db.Column(db.Integer, db.ForeignKey('flashcard.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    ease = db.Column(db.Float, nullable=False, default=2.5)
+    interval = db.Column(db.Float, nullable=False, default=0.0)  # days
+    repetitions = db.Column(db.Integer, nullable=False, default=0)
+    lapses = db.Column(db.Integer, nullable=False, default=0)
+    due_at = db.Column(db.DateTime, nullable=False)
+    last_reviewed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'card_id', name='uq_review_state_user_card'),
+        db.Index('ix_review_state_due', 'user_id', 'subject_id', 'due_at'),
+    )
+
+    def __repr__(self):
+        return f'<ReviewState User:{self.user_id} Card:{self.card_id} Due:{self.due_at}>'
+
+class ReviewEvent(db.Model):
+    """Append-only log of study actions.
+
+    The ids are plain columns rather than foreign keys so that the log
+    outlives the cards, subjects and users it refers to.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True)  # None for anonymous study of public subjects
+    subject_id = db.Column(db.Integer, nullable=False)
+    card_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # 'show', 'next' or 'grade'
+    grade = db.Column(db.String(10), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_review_event_user_subject_created', 'user_id', 'subject_id', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<ReviewEvent User:{self.user_id} Card:{self.card_id} {self.action}>'
+
+class SubjectProgress(db.Model):
+    """Rollup of one user's study activity in one subject."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    cards_seen = db.Column(db.Integer, nullable=False, default=0)
+    reviews = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
+    streak = db.Column(db.Integer, nullable=False, default=0)  # consecutive days studied
+    last_studied_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'subject_id', name='uq_subject_progress_user_subject'),
+    )
+
+    @property
+    def accuracy(self):
+        return self.correct / self.reviews if self.reviews else None
+
+    def __repr__(self):
+        return f'<SubjectProgress User:{self.user_id} Subject:{self.subject_id}>'
+
+class ClassProgress(db.Model):
+    """Rollup of one student's study activity across a classroom's subjects."""
+    id = db.Column(db.Integer, primary_key=True)
+    classroom_id = db.Column(db.Integer, db.ForeignKey('classroom.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    cards_seen = db.Column(db.Integer, nullable=False, default=0)
+    reviews = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
+    streak = db.Column(db.Integer, nullable=False, default=0)
+    last_studied_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('classroom_id', 'user_id', name='uq_class_progress_classroom_user'),
+    )
+
+    @property
+    def accuracy(self):
+        return self.correct / self.reviews if self.reviews else None
+
+    def __repr__(self):
+        return f'<ClassProgress Class:{self.classroom_id} User:{self.user_id}>'
+
+class ServerSession(db.Model):
+    """Session data for the database session backend (see server_sessions.py)."""
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_server_session_expires_at', 'expires_at'),
+    )
@@ -0,0 +1,122 @@
+"""Password hashing run in a bounded process pool.
+
+Hashing with scrypt or PBKDF2 is deliberately slow CPU work. Running it in
+worker processes keeps it off the web worker's GIL, so threaded servers keep
+serving other requests during a login rush, and the bounded pool caps how
+many cores hashing can take at once.
+
+Each web worker process starts its own pool, so W web workers run up to
+W * PASSWORD_HASH_WORKERS hashing processes. The default is one per web
+worker; raise it only for threaded workers that serve many logins, keeping
+the product at or below the number of cores. Sync workers still block
+while their hash runs; only threaded workers serve other requests meanwhile.
+
+Settings come from the environment:
+
+    PASSWORD_HASH_METHOD    werkzeug method string, e.g. "scrypt" or
+                            "pbkdf2:sha256:600000" (default "scrypt")
+    PASSWORD_HASH_WORKERS   size of each web worker's process pool; 0
+                            hashes in the calling thread (default 1)
+
+When the method changes, stored hashes are upgraded the next time their
+owner logs in (see needs_rehash).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+import threading
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+HASH_TIMEOUT = 30
+DEFAULT_WORKERS = 1
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def hash_method():
+    """Return the configured werkzeug hash method."""
+    return os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+
+
+def worker_count():
+    """Return the configured hashing pool size."""
+    try:
+        return int(os.environ.get("PASSWORD_HASH_WORKERS", DEFAULT_WORKERS))
+    except ValueError:
+        return DEFAULT_WORKERS
+
+
+def _get_executor():
+    """Return this process's hashing pool, creating it on first use or after a fork."""
+    global _executor, _executor_pid
+    workers = worker_count()
+    if workers <= 0:
+        return None
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # Spawn rather than fork: the web worker may already be running threads
+            _executor = ProcessPoolExecutor(max_workers=workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _discard(executor):
+    """Drop a pool whose child died so that the next call starts a fresh one."""
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(func, *args):
+    executor = _get_executor()
+    if executor is None:
+        return func(*args)
+    try:
+        return executor.submit(func, *args).result(timeout=HASH_TIMEOUT)
+    except BrokenProcessPool:
+        # A hashing process was killed (e.g. out of memory); retry once on a new pool
+        _discard(executor)
+        return _get_executor().submit(func, *args).result(timeout=HASH_TIMEOUT)
+
+
+def hash_password(password, method=None):
+    """Hash a password with the configured method."""
+    return _run(generate_password_hash, password, method or hash_method())
+
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash."""
+    return _run(check_password_hash, password_hash, password)
+
+
+def canonical_method(method):
+    """Expand a method string to the parameters werkzeug records in the hash."""
+    name, _, args = method.partition(":")
+    if name == "scrypt":
+        return "scrypt:" + (args or "32768:8:1")
+    if name == "pbkdf2":
+        digest, _, iterations = args.partition(":")
+        return f"pbkdf2:{digest or 'sha256'}:{iterations or DEFAULT_PBKDF2_ITERATIONS}"
+    return method
+
+
+def needs_rehash(password_hash, method=None):
+    """Check whether a stored hash was made with different parameters than configured."""
+    stored = password_hash.split("$", 1)[0]
+    return canonical_method(stored) != canonical_method(method or hash_method())
+
+
+def shutdown():
+    """Stop the hashing pool, e.g. from a server's worker-exit hook."""
+    global _executor
+    with _lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown()
+        _executor = None
@@ -0,0 +1,188 @@
+"""Incrementally maintained study-progress rollups.
+
+Every batch of review events written by review_log is folded into two
+rollup tables in the same transaction:
+
+    subject_progress    one row per (student, subject)
+    class_progress      one row per (classroom, student), covering the
+                        subjects that belong to the classroom
+
+so that teacher pages read one row per student instead of scanning cards
+and review states. Counters are updated with in-database increments, so
+concurrent writers in different processes do not lose each other's counts.
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, User, Subject, ReviewState, ReviewEvent, SubjectProgress, ClassProgress
+import scheduler
+
+REBUILD_BATCH_SIZE = 5000
+
+
+class _Delta:
+    """Grades accumulated for one rollup row within a batch."""
+
+    def __init__(self):
+        self.reviews = 0
+        self.correct = 0
+        self.cards_seen = 0
+        self.studied_at = []
+
+    def add(self, studied_at, passed):
+        self.reviews += 1
+        self.correct += passed
+        self.studied_at.append(studied_at)
+
+    def merge(self, other):
+        self.reviews += other.reviews
+        self.correct += other.correct
+        self.cards_seen += other.cards_seen
+        self.studied_at.extend(other.studied_at)
+
+
+def advance_streak(streak, last_studied_at, studied_at):
+    """Return the day streak after studying at `studied_at`."""
+    if last_studied_at is None:
+        return 1
+    gap = (studied_at.date() - last_studied_at.date()).days
+    if gap <= 0:
+        return streak or 1
+    return streak + 1 if gap == 1 else 1
+
+
+def _insert_missing(model, keys, rows):
+    """Create rollup rows that do not exist yet, tolerating concurrent inserts."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(model).on_conflict_do_nothing()
+    elif dialect == 'sqlite':
+        statement = sqlite.insert(model).on_conflict_do_nothing()
+    else:
+        statement = db.insert(model)
+    db.session.execute(statement, [dict(zip(keys, key)) for key in rows])
+
+
+def _load(model, keys, wanted):
+    """Return {key tuple: row} for the given keys, creating missing rows first."""
+    columns = [getattr(model, key) for key in keys]
+    query = model.query.filter(db.tuple_(*columns).in_(wanted))
+    rows = {tuple(getattr(row, key) for key in keys): row for row in query}
+    missing = [key for key in wanted if key not in rows]
+    if missing:
+        _insert_missing(model, keys, missing)
+        rows = {tuple(getattr(row, key) for key in keys): row for row in query.populate_existing()}
+    return rows
+
+
+def _apply(row, delta):
+    model = type(row)
+    streak, last_studied_at = row.streak, row.last_studied_at
+    for studied_at in sorted(delta.studied_at):
+        streak = advance_streak(streak, last_studied_at, studied_at)
+        if last_studied_at is None or studied_at > last_studied_at:
+            last_studied_at = studied_at
+    row.cards_seen = model.cards_seen + delta.cards_seen
+    row.reviews = model.reviews + delta.reviews
+    row.correct = model.correct + delta.correct
+    row.streak = streak
+    row.last_studied_at = last_studied_at
+
+
+def apply_events(events):
+    """Fold a batch of review events into the rollups. The caller commits.
+
+    Events of users or subjects that no longer exist are skipped.
+    """
+    deltas = {}
+    for event in events:
+        if event["action"] != "grade" or event["user_id"] is None:
+            continue
+        delta = deltas.setdefault((event["user_id"], event["subject_id"]), _Delta())
+        delta.add(event["created_at"], event["grade"] in scheduler.PASSING_GRADES)
+    if not deltas:
+        return
+
+    # The log outlives its users and subjects; skip rollups of deleted ones
+    classrooms = dict(db.session.execute(
+        db.select(Subject.id, Subject.classroom_id)
+        .filter(Subject.id.in_({subject_id for _, subject_id in deltas}))
+    ).all())
+    users = set(db.session.scalars(
+        db.select(User.id).filter(User.id.in_({user_id for user_id, _ in deltas}))
+    ))
+    deltas = {pair: delta for pair, delta in deltas.items()
+              if pair[0] in users and pair[1] in classrooms}
+    if not deltas:
+        return
+
+    pairs = list(deltas)
+    seen = dict(
+        ((user_id, subject_id), count) for user_id, subject_id, count in db.session.execute(
+            db.select(ReviewState.user_id, ReviewState.subject_id, db.func.count(ReviewState.id))
+            .filter(db.tuple_(ReviewState.user_id, ReviewState.subject_id).in_(pairs))
+            .group_by(ReviewState.user_id, ReviewState.subject_id)
+        )
+    )
+    subject_rows = _load(SubjectProgress, ('user_id', 'subject_id'), pairs)
+    class_deltas = {}
+    for pair, delta in deltas.items():
+        row = subject_rows[pair]
+        # Cards seen is re-read from review_state rather than counted, so
+        # repeated grades of one card and forgotten cards stay accurate
+        delta.cards_seen = seen.get(pair, 0) - row.cards_seen
+        _apply(row, delta)
+
+        user_id, subject_id = pair
+        if classrooms[subject_id] is not None:
+            class_deltas.setdefault((classrooms[subject_id], user_id), _Delta()).merge(delta)
+
+    if class_deltas:
+        class_rows = _load(ClassProgress, ('classroom_id', 'user_id'), list(class_deltas))
+        for key, delta in class_deltas.items():
+            _apply(class_rows[key], delta)
+    db.session.flush()
+
+
+def student_subjects(user_id):
+    """Return [(SubjectProgress, subject name)] for a user, most recently studied first."""
+    return db.session.execute(
+        db.select(SubjectProgress, Subject.name)
+        .join(Subject, Subject.id == SubjectProgress.subject_id)
+        .filter(SubjectProgress.user_id == user_id)
+        .order_by(SubjectProgress.last_studied_at.desc())
+    ).all()
+
+
+def class_overview(classroom_id):
+    """Return ({user_id: ClassProgress}, summary dict) for a classroom."""
+    rows = {row.user_id: row for row in ClassProgress.query.filter_by(classroom_id=classroom_id)}
+    reviews = sum(row.reviews for row in rows.values())
+    correct = sum(row.correct for row in rows.values())
+    summary = {
+        "active_students": sum(1 for row in rows.values() if row.reviews),
+        "reviews": reviews,
+        "cards_seen": sum(row.cards_seen for row in rows.values()),
+        "accuracy": correct / reviews if reviews else None,
+        "last_studied_at": max((row.last_studied_at for row in rows.values() if row.last_studied_at),
+                               default=None),
+    }
+    return rows, summary
+
+
+def rebuild():
+    """Recompute every rollup from the review event log."""
+    db.session.execute(db.delete(ClassProgress))
+    db.session.execute(db.delete(SubjectProgress))
+    result = db.session.execute(
+        db.select(ReviewEvent.user_id, ReviewEvent.subject_id, ReviewEvent.action,
+                  ReviewEvent.grade, ReviewEvent.created_at)
+        .filter(ReviewEvent.action == "grade", ReviewEvent.user_id.is_not(None))
+        .order_by(ReviewEvent.created_at, ReviewEvent.id)
+        .execution_options(yield_per=REBUILD_BATCH_SIZE)
+    ).mappings()
+    count = 0
+    for partition in result.partitions():
+        apply_events(partition)
+        count += len(partition)
+    db.session.commit()
+    return count
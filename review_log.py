@@ -0,0 +1,150 @@
+"""Buffered, asynchronous writes of study events.
+
+record() only appends to an in-process buffer. A background thread writes
+the buffer to the review_event table in batches, whenever it reaches
+REVIEW_LOG_BATCH_SIZE events or REVIEW_LOG_FLUSH_INTERVAL seconds have
+passed, and drains it once more when the process exits. Each batch also
+updates the progress rollups in the same transaction (see progress.py),
+inside a savepoint so that a failed rollup never loses the events.
+
+Each app gets its own writer in app.extensions["review_log"], so events
+are always written to the database of the app that recorded them.
+
+Events still in the buffer are lost if the process is killed outright,
+which is an acceptable trade for activity logging.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+import weakref
+
+from flask import current_app
+
+from models import db, ReviewEvent
+import progress
+import scheduler
+
+logger = logging.getLogger(__name__)
+
+class ReviewLogWriter:
+    """Collects review events and writes them to the database in batches."""
+
+    def __init__(self, app, batch_size=500, flush_interval=2.0, max_buffer=50000):
+        self.app = app
+        self.batch_size = app.config.get("REVIEW_LOG_BATCH_SIZE", batch_size)
+        self.flush_interval = app.config.get("REVIEW_LOG_FLUSH_INTERVAL", flush_interval)
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self.written = 0
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+    def record(self, user_id, subject_id, card_id, action, grade=None):
+        """Queue one study event without touching the database."""
+        event = {
+            "user_id": user_id,
+            "subject_id": subject_id,
+            "card_id": card_id,
+            "action": action,
+            "grade": grade,
+            "created_at": scheduler.utcnow(),
+        }
+        with self._cond:
+            self._ensure_thread()
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return
+            self._buffer.append(event)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Write everything buffered so far. Safe to call from any thread."""
+        with self._cond:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._write(batch)
+
+    def stop(self):
+        """Stop the writer thread after draining the buffer."""
+        with self._cond:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout=10)
+        self.flush()
+
+    def _ensure_thread(self):
+        # Called with the condition held. A forked worker needs its own thread,
+        # and events buffered before the fork are the parent's to write.
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            if self._pid is not None and self._pid != os.getpid():
+                self._buffer = []
+            self._stopping = False
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="review-log-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopping and len(self._buffer) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._buffer = self._buffer, []
+                stopping = self._stopping
+            if batch:
+                self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                db.session.execute(db.insert(ReviewEvent), batch)
+                try:
+                    # A failed rollup must not lose the events; rebuild() can redo it
+                    with db.session.begin_nested():
+                        progress.apply_events(batch)
+                except Exception:
+                    logger.exception("Failed to update progress for %d review events", len(batch))
+                db.session.commit()
+                self.written += len(batch)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Failed to write %d review events", len(batch))
+
+
+_writers = weakref.WeakSet()
+
+
+def init_app(app):
+    """Give an app its own writer."""
+    writer = app.extensions["review_log"] = ReviewLogWriter(app)
+    _writers.add(writer)
+    return writer
+
+
+def get_writer():
+    """Return the current app's writer."""
+    return current_app.extensions["review_log"]
+
+
+def record(user_id, subject_id, card_id, action, grade=None):
+    """Queue one study event for the current app."""
+    get_writer().record(user_id, subject_id, card_id, action, grade)
+
+
+@atexit.register
+def _stop_all():
+    for writer in list(_writers):
+        writer.stop()
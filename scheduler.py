@@ -0,0 +1,75 @@
+"""SM-2 style spaced-repetition math.
+
+This module is pure: it knows nothing about the database or Flask, so the
+same functions serve both a single grade in the study loop and a bulk
+recomputation of a whole deck.
+"""
+from datetime import datetime, timedelta, timezone
+
+GRADES = ('again', 'hard', 'good', 'easy')
+PASSING_GRADES = ('hard', 'good', 'easy')  # the card was recalled
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+MAX_INTERVAL = 36500.0  # days
+AGAIN_DELAY = timedelta(minutes=10)
+
+
+def utcnow():
+    """Return the current UTC time as a naive datetime, as stored in the database."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def next_state(ease, interval, repetitions, lapses, grade):
+    """Apply a grade to a card's state.
+
+    Returns a tuple of (ease, interval, repetitions, lapses), where interval
+    is in days. An interval of 0 means the card is shown again shortly.
+    """
+    if grade not in GRADES:
+        raise ValueError(f"Unknown grade: {grade}")
+
+    if grade == 'again':
+        return max(MIN_EASE, ease - 0.2), 0.0, 0, lapses + 1
+
+    if grade == 'hard':
+        ease = max(MIN_EASE, ease - 0.15)
+        interval = 1.0 if repetitions == 0 else interval * 1.2
+    elif grade == 'good':
+        if repetitions == 0:
+            interval = 1.0
+        elif repetitions == 1:
+            interval = 6.0
+        else:
+            interval = interval * ease
+    else:
+        ease = ease + 0.15
+        if repetitions == 0:
+            interval = 4.0
+        elif repetitions == 1:
+            interval = 6.0 * 1.3
+        else:
+            interval = interval * ease * 1.3
+
+    return ease, min(max(interval, 1.0), MAX_INTERVAL), repetitions + 1, lapses
+
+
+def due_date(reviewed_at, interval):
+    """Return when a card reviewed at `reviewed_at` with `interval` days is due."""
+    if interval <= 0:
+        return reviewed_at + AGAIN_DELAY
+    return reviewed_at + timedelta(days=interval)
+
+
+def reschedule(last_reviewed, intervals, scale=1.0, now=None):
+    """Recompute intervals and due dates for a whole deck in one pass.
+
+    `last_reviewed` and `intervals` are parallel columns; cards that were
+    never reviewed are due immediately. Returns (intervals, due_dates).
+    """
+    now = now or utcnow()
+    new_intervals = [min(interval * scale, MAX_INTERVAL) if interval > 0 else 0.0
+                     for interval in intervals]
+    due_dates = [now if reviewed is None else due_date(reviewed, interval)
+                 for reviewed, interval in zip(last_reviewed, new_intervals)]
+    return new_intervals, due_dates
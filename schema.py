@@ -0,0 +1,83 @@
+"""Schema migrations and query-plan checks for the hot lookups."""
+import os
+
+from flask import current_app
+from sqlalchemy import inspect, text
+
+from models import db, User, Flashcard, Subject, Purchase, Classroom, ClassMembership, ReviewState
+import scheduler
+
+BASELINE_REVISION = '0001'
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def init_migrations(app):
+    """Register Flask-Migrate with an app.
+
+    Flask-Migrate (and alembic) are imported here rather than at module
+    level because they take as long to import as the rest of the app.
+    """
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+
+        Migrate(app, db, directory=MIGRATIONS_DIRECTORY)
+
+
+def upgrade_database():
+    """Bring the database schema up to date.
+
+    Databases created by db.create_all() before migrations existed have no
+    alembic_version table; they are stamped at the baseline revision first so
+    that only the later revisions run against them.
+    """
+    from flask_migrate import stamp, upgrade
+
+    init_migrations(current_app)
+    inspector = inspect(db.engine)
+    if inspector.has_table('user') and not inspector.has_table('alembic_version'):
+        stamp(revision=BASELINE_REVISION)
+    upgrade()
+
+
+def hot_queries():
+    """Return (name, statement) pairs for the lookups the app runs most."""
+    now = scheduler.utcnow()
+    return [
+        ("purchase lookup",
+         db.select(Purchase.id).filter_by(user_id=1, subject_id=1).limit(1)),
+        ("class membership check",
+         db.select(ClassMembership.id).filter_by(user_id=1, classroom_id=1).limit(1)),
+        ("class roster",
+         db.select(ClassMembership.user_id).filter_by(classroom_id=1)),
+        ("card ids for a subject",
+         db.select(Flashcard.id).filter_by(subject_id=1).order_by(Flashcard.id)),
+        ("card count per subject",
+         db.select(Flashcard.subject_id, db.func.count(Flashcard.id))
+         .filter(Flashcard.subject_id.in_([1, 2, 3])).group_by(Flashcard.subject_id)),
+        ("subjects owned by a user",
+         db.select(Subject.id).filter_by(user_id=1)),
+        ("subjects in a classroom",
+         db.select(Subject.id).filter_by(classroom_id=1)),
+        ("classrooms taught by a user",
+         db.select(Classroom.id).filter_by(teacher_id=1)),
+        ("admin users page by role",
+         db.select(User.id).filter(User.role == 'student', User.id > 1).order_by(User.id).limit(51)),
+        ("admin subjects page by name",
+         db.select(Subject.id).filter(db.tuple_(Subject.name, Subject.id) > ('a', 1))
+         .order_by(Subject.name, Subject.id).limit(51)),
+        ("next due review",
+         db.select(ReviewState.card_id)
+         .filter(ReviewState.user_id == 1, ReviewState.subject_id == 1, ReviewState.due_at <= now)
+         .order_by(ReviewState.due_at).limit(1)),
+    ]
+
+
+def explain(statement):
+    """Return the database's query plan for a statement as a list of lines."""
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if dialect.name == 'sqlite' else "EXPLAIN "
+    rows = db.session.execute(text(prefix + sql)).all()
+    if dialect.name == 'sqlite':
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
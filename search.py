@@ -0,0 +1,102 @@
+"""Full-text search over public and for-sale subjects.
+
+On PostgreSQL, subject names and card text are indexed through generated
+``tsvector`` columns with GIN indexes. On SQLite, FTS5 tables are kept in
+sync by triggers. Either way the index is updated by the database as cards
+and subjects are written, so it never needs a full rebuild. Migration 0003
+(migrations/versions/0003_search_index.py) creates these structures.
+"""
+import re
+
+from sqlalchemy import text
+
+from models import db
+import keyset
+
+PAGE_SIZE = 20
+
+_word_re = re.compile(r"\w+", re.UNICODE)
+
+# Each dialect produces (subject_id, score) hits, higher scores ranking first.
+# Matches on the subject name count double.
+_sqlite_hits = """
+    SELECT rowid AS subject_id, -2 * bm25(subject_search) AS score
+    FROM subject_search WHERE subject_search MATCH :query
+    UNION ALL
+    SELECT subject_id, -bm25(card_search) AS score
+    FROM card_search WHERE card_search MATCH :query
+"""
+
+_postgres_hits = """
+    SELECT subject.id AS subject_id, 2 * ts_rank(subject.search_vector, q) AS score
+    FROM subject, to_tsquery('simple', :query) AS q WHERE subject.search_vector @@ q
+    UNION ALL
+    SELECT flashcard.subject_id, ts_rank(flashcard.search_vector, q) AS score
+    FROM flashcard, to_tsquery('simple', :query) AS q WHERE flashcard.search_vector @@ q
+"""
+
+_ranked = """
+    WITH hits AS ({hits})
+    SELECT hits.subject_id, MAX(hits.score) AS score, COUNT(*) AS matches
+    FROM hits JOIN subject ON subject.id = hits.subject_id
+    WHERE subject.is_public OR subject.is_for_sale
+    GROUP BY hits.subject_id
+    {after}
+    ORDER BY score DESC, hits.subject_id DESC
+    LIMIT :limit
+"""
+
+_after = """
+    HAVING MAX(hits.score) < :after_score
+        OR (MAX(hits.score) = :after_score AND hits.subject_id < :after_id)
+"""
+
+
+def _is_postgres(bind):
+    return bind.dialect.name == 'postgresql'
+
+
+def to_query(terms, postgres=False):
+    """Turn free text into a match expression for any of its words, the last as a prefix."""
+    words = _word_re.findall(terms or '')
+    if not words:
+        return None
+    if postgres:
+        return ' | '.join(words[:-1] + [words[-1] + ':*'])
+    return ' OR '.join([f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*'])
+
+
+def decode_cursor(cursor):
+    """Decode a search cursor into (score, subject_id), or return None if it is invalid."""
+    values = keyset.decode_cursor(cursor, (float, int))
+    if values is None:
+        return None
+    return float(values[0]), values[1]
+
+
+def search_subjects(terms, after=None, limit=PAGE_SIZE):
+    """Rank public and for-sale subjects matching `terms`.
+
+    Returns a list of (subject_id, score, matches) and the cursor for the
+    next page, or None if this is the last page.
+    """
+    postgres = _is_postgres(db.session.get_bind())
+    query = to_query(terms, postgres)
+    if query is None:
+        return [], None
+
+    params = {"query": query, "limit": limit + 1}
+    after_clause = ""
+    position = decode_cursor(after) if after else None
+    if position:
+        params["after_score"], params["after_id"] = position
+        after_clause = _after
+
+    sql = _ranked.format(hits=_postgres_hits if postgres else _sqlite_hits, after=after_clause)
+    rows = db.session.execute(text(sql), params).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = keyset.encode_cursor([rows[-1].score, rows[-1].subject_id])
+    return [(r.subject_id, r.score, r.matches) for r in rows], next_cursor
@@ -0,0 +1,242 @@
+"""Server-side sessions.
+
+The cookie carries only a random session id; the session data lives in a
+store chosen with the SESSION_BACKEND config key (or environment variable):
+
+    cookie      Flask's signed cookie session (the default)
+    memory      in-process LRU, for a single worker process
+    database    the server_session table, shared by every worker
+    redis       a Redis-compatible server at SESSION_REDIS_URL
+                (requires the redis package)
+
+Sessions are written back only when they were modified, or when more than
+half of their lifetime has passed so that active users are not logged out.
+Expired sessions are dropped when they are next read; the database store
+can also be purged with `flask purge-sessions`.
+"""
+from collections import OrderedDict
+from datetime import timedelta
+import os
+import secrets
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from models import db, ServerSession
+import scheduler
+
+BACKENDS = ("cookie", "memory", "database", "redis")
+MEMORY_MAX_SESSIONS = 10000
+
+serializer = TaggedJSONSerializer()
+
+
+class StoredSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id and whether it changed."""
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = sid is None
+        self.expires_at = expires_at  # time.time() when loaded from the store
+        self.modified = False
+        self.opened_user_id = self.get("_user_id")
+
+    def __setitem__(self, key, value):
+        # Re-assigning an unchanged value (e.g. show_answer = False on every
+        # study step) should not force a write to the store
+        if key in self and self[key] == value:
+            return
+        super().__setitem__(key, value)
+
+
+class MemoryStore:
+    """LRU of serialized sessions with lazy expiry."""
+
+    def __init__(self, max_sessions=MEMORY_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._data = OrderedDict()  # sid -> (expires_at, payload)
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return entry
+
+    def set(self, sid, payload, expires_at):
+        with self._lock:
+            self._data[sid] = (expires_at, payload)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.max_sessions:
+                self._data.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+
+class DatabaseStore:
+    """Sessions in the server_session table.
+
+    Uses its own short transactions on the engine, so saving a session never
+    commits or rolls back whatever the request left in db.session.
+    """
+
+    def get(self, sid):
+        table = ServerSession.__table__
+        with db.engine.begin() as conn:
+            row = conn.execute(
+                db.select(table.c.expires_at, table.c.data).where(table.c.id == sid)
+            ).first()
+            if row is None:
+                return None
+            if row.expires_at <= scheduler.utcnow():
+                conn.execute(db.delete(table).where(table.c.id == sid))
+                return None
+        return _utc_timestamp(row.expires_at), row.data
+
+    def set(self, sid, payload, expires_at):
+        table = ServerSession.__table__
+        values = {"data": payload, "expires_at": _utc_datetime(expires_at)}
+        with db.engine.begin() as conn:
+            updated = conn.execute(db.update(table).where(table.c.id == sid).values(**values))
+            if not updated.rowcount:
+                conn.execute(db.insert(table).values(id=sid, **values))
+
+    def delete(self, sid):
+        table = ServerSession.__table__
+        with db.engine.begin() as conn:
+            conn.execute(db.delete(table).where(table.c.id == sid))
+
+    def purge_expired(self):
+        table = ServerSession.__table__
+        with db.engine.begin() as conn:
+            return conn.execute(db.delete(table).where(table.c.expires_at <= scheduler.utcnow())).rowcount
+
+
+class RedisStore:
+    """Sessions in a Redis-compatible server, which expires keys itself."""
+
+    prefix = "session:"
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, sid):
+        key = self.prefix + sid
+        pipe = self.client.pipeline()
+        pipe.get(key)
+        pipe.pttl(key)
+        payload, ttl = pipe.execute()
+        if payload is None:
+            return None
+        return time.time() + max(ttl, 0) / 1000, payload
+
+    def set(self, sid, payload, expires_at):
+        ttl = max(int((expires_at - time.time()) * 1000), 1)
+        self.client.set(self.prefix + sid, payload, px=ttl)
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+
+def _utc_datetime(timestamp):
+    return scheduler.utcnow() + timedelta(seconds=timestamp - time.time())
+
+
+def _utc_timestamp(value):
+    return time.time() + (value - scheduler.utcnow()).total_seconds()
+
+
+class ServerSessionInterface(SessionInterface):
+    """Keeps session data in a store and only a random id in the cookie."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            entry = self.store.get(sid)
+            if entry is not None:
+                expires_at, payload = entry
+                try:
+                    return StoredSession(serializer.loads(payload), sid, expires_at)
+                except ValueError:
+                    self.store.delete(sid)
+        return StoredSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.sid is not None and session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        stale = session.expires_at is not None and session.expires_at - now < lifetime / 2
+        if not (session.new or session.modified or stale):
+            return
+
+        if session.sid is not None and session.get("_user_id") != session.opened_user_id:
+            # Issue a new id when Flask-Login logs a user in or out, so a
+            # session id planted before login cannot be used afterwards
+            self.store.delete(session.sid)
+            session.sid = None
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        self.store.set(session.sid, serializer.dumps(dict(session)).encode("utf-8"), now + lifetime)
+        response.set_cookie(name, session.sid,
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app),
+                            domain=domain, path=path,
+                            secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
+
+
+def make_interface(backend, config):
+    """Build the session interface for a backend name, or None for cookie sessions."""
+    if backend == "cookie":
+        return None
+    if backend == "memory":
+        return ServerSessionInterface(MemoryStore(config.get("SESSION_MEMORY_MAX", MEMORY_MAX_SESSIONS)))
+    if backend == "database":
+        return ServerSessionInterface(DatabaseStore())
+    if backend == "redis":
+        return ServerSessionInterface(RedisStore(config.get("SESSION_REDIS_URL", "redis://localhost:6379/0")))
+    raise ValueError(f"Unknown session backend: {backend}")
+
+
+def init_app(app):
+    """Install the configured session backend."""
+    backend = app.config.setdefault("SESSION_BACKEND", os.environ.get("SESSION_BACKEND", "cookie"))
+    if "SESSION_REDIS_URL" in os.environ:
+        app.config.setdefault("SESSION_REDIS_URL", os.environ["SESSION_REDIS_URL"])
+    interface = make_interface(backend, app.config)
+    if interface is not None:
+        app.session_interface = interface
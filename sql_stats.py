@@ -0,0 +1,141 @@
+"""Opt-in per-request SQL instrumentation.
+
+Enable it with the SQL_STATS environment variable (or the SQL_STATS_ENABLED
+config key). When disabled, no event listeners or request hooks are
+registered at all, so the app runs exactly as it would without this module.
+"""
+from collections import Counter, defaultdict
+import re
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from models import db
+
+SLOWEST_PER_ENDPOINT = 5
+UNMATCHED = "<unmatched>"
+
+_whitespace_re = re.compile(r"\s+")
+_literal_re = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_param_list_re = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)|\((?:\s*%s\s*,)+\s*%s\s*\)")
+
+_lock = threading.Lock()
+_endpoints = defaultdict(lambda: {
+    "requests": 0,
+    "queries": 0,
+    "db_time": 0.0,
+    "max_queries": 0,
+    "slowest": [],
+    "n_plus_one": Counter(),
+})
+
+
+def is_enabled(app):
+    """Check whether SQL stats collection is turned on for an app."""
+    return app.config.get("SQL_STATS_ENABLED", False)
+
+
+def statement_shape(statement):
+    """Normalize a statement so repeated executions with different values compare equal."""
+    shape = _whitespace_re.sub(" ", statement).strip()
+    shape = _literal_re.sub("?", shape)
+    return _param_list_re.sub("(?)", shape)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "sql_stats" in g:
+        conn.info.setdefault("sql_stats_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("sql_stats_start")
+    if not starts or not has_request_context() or "sql_stats" not in g:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = g.sql_stats
+    stats["queries"] += 1
+    stats["db_time"] += elapsed
+    stats["statements"].append((elapsed, statement))
+    stats["shapes"][statement_shape(statement)] += 1
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    conn = context.connection
+    if conn is not None and context.execution_context is not None and has_request_context() and "sql_stats" in g:
+        starts = conn.info.get("sql_stats_start")
+        if starts:
+            starts.pop()
+
+
+def _before_request():
+    g.sql_stats = {"queries": 0, "db_time": 0.0, "statements": [], "shapes": Counter()}
+
+
+def _after_request(response):
+    stats = g.pop("sql_stats", None)
+    if stats is None:
+        return response
+
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={stats["db_time"] * 1000:.2f};desc="{stats["queries"]} queries"',
+    )
+
+    threshold = current_app.config.get("SQL_STATS_N_PLUS_ONE_THRESHOLD", 5)
+    repeated = {shape: n for shape, n in stats["shapes"].items() if n >= threshold}
+    slowest = sorted(stats["statements"], key=lambda s: s[0], reverse=True)[:SLOWEST_PER_ENDPOINT]
+
+    with _lock:
+        # Unrouted URLs share one bucket, so clients cannot add entries at will
+        entry = _endpoints[request.endpoint or UNMATCHED]
+        entry["requests"] += 1
+        entry["queries"] += stats["queries"]
+        entry["db_time"] += stats["db_time"]
+        entry["max_queries"] = max(entry["max_queries"], stats["queries"])
+        entry["n_plus_one"].update(repeated)
+        merged = entry["slowest"] + [(elapsed, statement_shape(s)) for elapsed, s in slowest]
+        entry["slowest"] = sorted(merged, key=lambda s: s[0], reverse=True)[:SLOWEST_PER_ENDPOINT]
+    return response
+
+
+def snapshot():
+    """Return a copy of the collected per-endpoint stats, busiest endpoints first."""
+    with _lock:
+        rows = [
+            {
+                "endpoint": endpoint,
+                "requests": entry["requests"],
+                "queries": entry["queries"],
+                "avg_queries": entry["queries"] / entry["requests"],
+                "max_queries": entry["max_queries"],
+                "db_time_ms": entry["db_time"] * 1000,
+                "avg_db_time_ms": entry["db_time"] * 1000 / entry["requests"],
+                "slowest": [(elapsed * 1000, shape) for elapsed, shape in entry["slowest"]],
+                "n_plus_one": entry["n_plus_one"].most_common(SLOWEST_PER_ENDPOINT),
+            }
+            for endpoint, entry in _endpoints.items()
+            if entry["requests"]
+        ]
+    return sorted(rows, key=lambda r: r["db_time_ms"], reverse=True)
+
+
+def reset():
+    """Discard all collected stats."""
+    with _lock:
+        _endpoints.clear()
+
+
+def init_app(app):
+    """Register the instrumentation hooks if SQL stats are enabled."""
+    if not is_enabled(app):
+        return
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
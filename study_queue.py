@@ -0,0 +1,171 @@
+from models import db, Flashcard, ReviewState
+import scheduler
+
+
+def next_due_card(user_id, subject_id, exclude_card_id=None):
+    """Return the next card a user should study in a subject.
+
+    Cards that are due come first (oldest due date first), then cards the
+    user has never seen, then whichever card is due soonest.
+    """
+    now = scheduler.utcnow()
+
+    due_query = db.select(ReviewState.card_id).filter(
+        ReviewState.user_id == user_id,
+        ReviewState.subject_id == subject_id,
+        ReviewState.due_at <= now,
+    )
+    if exclude_card_id is not None:
+        due_query = due_query.filter(ReviewState.card_id != exclude_card_id)
+    card_id = db.session.scalar(due_query.order_by(ReviewState.due_at).limit(1))
+
+    if card_id is None:
+        seen = db.select(ReviewState.id).filter(
+            ReviewState.user_id == user_id,
+            ReviewState.card_id == Flashcard.id,
+        )
+        unseen = db.select(Flashcard.id).filter(Flashcard.subject_id == subject_id, ~seen.exists())
+        if exclude_card_id is not None:
+            # Skipping a card records nothing, so continue after it rather
+            # than returning the lowest unseen id again
+            card_id = db.session.scalar(
+                unseen.filter(Flashcard.id > exclude_card_id).order_by(Flashcard.id).limit(1))
+            unseen = unseen.filter(Flashcard.id != exclude_card_id)
+        if card_id is None:
+            card_id = db.session.scalar(unseen.order_by(Flashcard.id).limit(1))
+
+    if card_id is None:
+        ahead_query = db.select(ReviewState.card_id).filter(
+            ReviewState.user_id == user_id,
+            ReviewState.subject_id == subject_id,
+        )
+        if exclude_card_id is not None:
+            ahead_query = ahead_query.filter(ReviewState.card_id != exclude_card_id)
+        card_id = db.session.scalar(ahead_query.order_by(ReviewState.due_at).limit(1))
+
+    if card_id is None:
+        return None
+    return db.session.get(Flashcard, card_id)
+
+
+def next_due_cards(user_id, subject_id, limit, exclude_card_ids=()):
+    """Return up to `limit` cards in the order next_due_card would pick them.
+
+    Three queries at most, however many cards are requested.
+    """
+    now = scheduler.utcnow()
+    exclude_card_ids = set(exclude_card_ids)
+    states = db.select(ReviewState.card_id).filter(
+        ReviewState.user_id == user_id,
+        ReviewState.subject_id == subject_id,
+    )
+    if exclude_card_ids:
+        states = states.filter(ReviewState.card_id.notin_(exclude_card_ids))
+
+    card_ids = list(db.session.scalars(
+        states.filter(ReviewState.due_at <= now).order_by(ReviewState.due_at).limit(limit)))
+
+    if len(card_ids) < limit:
+        seen = db.select(ReviewState.id).filter(
+            ReviewState.user_id == user_id,
+            ReviewState.card_id == Flashcard.id,
+        )
+        unseen = db.select(Flashcard.id).filter(Flashcard.subject_id == subject_id, ~seen.exists())
+        if exclude_card_ids:
+            unseen = unseen.filter(Flashcard.id.notin_(exclude_card_ids))
+        card_ids += db.session.scalars(unseen.order_by(Flashcard.id).limit(limit - len(card_ids)))
+
+    if len(card_ids) < limit:
+        card_ids += db.session.scalars(
+            states.filter(ReviewState.due_at > now)
+            .order_by(ReviewState.due_at)
+            .limit(limit - len(card_ids)))
+
+    if not card_ids:
+        return []
+    cards = {card.id: card for card in Flashcard.query.filter(Flashcard.id.in_(card_ids))}
+    return [cards[card_id] for card_id in card_ids if card_id in cards]
+
+
+def _new_state(user_id, card_id, subject_id):
+    return ReviewState(user_id=user_id, card_id=card_id, subject_id=subject_id,
+                       ease=scheduler.DEFAULT_EASE, interval=0.0, repetitions=0, lapses=0)
+
+
+def _apply_grade(state, grade, now):
+    state.ease, state.interval, state.repetitions, state.lapses = scheduler.next_state(
+        state.ease, state.interval, state.repetitions, state.lapses, grade)
+    state.last_reviewed_at = now
+    state.due_at = scheduler.due_date(now, state.interval)
+
+
+def record_grade(user_id, card, grade):
+    """Apply a grade to the user's review state for a card."""
+    state = ReviewState.query.filter_by(user_id=user_id, card_id=card.id).first()
+    if state is None:
+        state = _new_state(user_id, card.id, card.subject_id)
+        db.session.add(state)
+
+    _apply_grade(state, grade, scheduler.utcnow())
+    db.session.commit()
+    return state
+
+
+def record_grades(user_id, subject_id, grades):
+    """Apply a batch of (card_id, grade) pairs in order, with one commit.
+
+    Pairs whose card is not in the subject or whose grade is unknown are
+    skipped. Returns the pairs that were applied.
+    """
+    grades = [(card_id, grade) for card_id, grade in grades if grade in scheduler.GRADES]
+    if not grades:
+        return []
+    card_ids = {card_id for card_id, _ in grades}
+    valid = set(db.session.scalars(
+        db.select(Flashcard.id).filter(Flashcard.subject_id == subject_id, Flashcard.id.in_(card_ids))))
+    states = {state.card_id: state for state in ReviewState.query.filter(
+        ReviewState.user_id == user_id, ReviewState.card_id.in_(valid))}
+
+    now = scheduler.utcnow()
+    applied = []
+    for card_id, grade in grades:
+        if card_id not in valid:
+            continue
+        state = states.get(card_id)
+        if state is None:
+            state = states[card_id] = _new_state(user_id, card_id, subject_id)
+            db.session.add(state)
+        _apply_grade(state, grade, now)
+        applied.append((card_id, grade))
+    db.session.commit()
+    return applied
+
+
+def forget_subject(subject_id):
+    """Delete every user's review state for a subject."""
+    db.session.execute(db.delete(ReviewState).where(ReviewState.subject_id == subject_id))
+
+
+def forget_cards(card_ids):
+    """Delete review states for cards that are about to be deleted."""
+    db.session.execute(db.delete(ReviewState).where(ReviewState.card_id.in_(card_ids)))
+
+
+def reschedule_subject(subject_id, scale=1.0):
+    """Scale every interval in a subject and recompute due dates in bulk."""
+    rows = db.session.execute(
+        db.select(ReviewState.id, ReviewState.last_reviewed_at, ReviewState.interval)
+        .filter_by(subject_id=subject_id)
+    ).all()
+    if not rows:
+        return 0
+
+    ids, last_reviewed, intervals = zip(*rows)
+    intervals, due_dates = scheduler.reschedule(last_reviewed, intervals, scale)
+    db.session.execute(
+        db.update(ReviewState),
+        [{"id": state_id, "interval": interval, "due_at": due_at}
+         for state_id, interval, due_at in zip(ids, intervals, due_dates)],
+    )
+    db.session.commit()
+    return len(ids)
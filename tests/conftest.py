@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.pop("INSTANCE_CONNECTION_NAME", None)
+
+import app as app_module
+import schema
+from models import db, User, Subject, Flashcard
+
+
+@pytest.fixture
+def app():
+    app = app_module.create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite://",
+                                 "PRECOMPILE_TEMPLATES": False})
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def migrated_app(tmp_path):
+    """An app on a SQLite file built by the migrations, with the search index."""
+    app = app_module.create_app({"TESTING": True, "PRECOMPILE_TEMPLATES": False,
+                                 "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'migrated.db'}"})
+    with app.app_context():
+        schema.upgrade_database()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def deck(app):
+    """A teacher, a student and a subject of five cards; returns (student_id, subject_id, card_ids)."""
+    teacher = User(username="teacher", email="teacher@example.com", role="teacher")
+    student = User(username="student", email="student@example.com", role="student")
+    for user in (teacher, student):
+        user.set_password("secret")
+    db.session.add_all([teacher, student])
+    db.session.flush()
+    subject = Subject(name="Capitals", user_id=teacher.id)
+    db.session.add(subject)
+    db.session.flush()
+    cards = [Flashcard(question=f"q{n}", answer=f"a{n}", user_id=teacher.id, subject_id=subject.id)
+             for n in range(5)]
+    db.session.add_all(cards)
+    db.session.commit()
+    return student.id, subject.id, [card.id for card in cards]
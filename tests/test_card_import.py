@@ -0,0 +1,20 @@
+import io
+
+import card_import
+from models import Flashcard
+
+
+def test_unparseable_rows_are_rejected(deck):
+    _, subject_id, _ = deck
+    stream = io.StringIO("question,answer\nr1,a1\nr2," + "x" * 200000 + "\nr3,\nr4,a4\n")
+    result = card_import.import_cards(stream, subject_id, 1)
+
+    assert result.imported == 2
+    assert [line for line, _ in result.errors] == [3, 4]
+    assert Flashcard.query.filter_by(subject_id=subject_id, question="r4").count() == 1
+
+
+def test_anki_line_numbers_count_the_header_lines():
+    stream = io.StringIO("#separator:tab\n#html:false\nq1\ta1\nq2\ta2\n")
+    assert [(line, fields) for line, fields, _ in card_import.iter_rows(stream, "anki")] == [
+        (3, ["q1", "a1"]), (4, ["q2", "a2"])]
@@ -0,0 +1,23 @@
+import card_selection
+
+
+def test_card_id_cache_is_bounded_and_drops_expired_entries(deck, monkeypatch):
+    _, subject_id, card_ids = deck
+    monkeypatch.setattr(card_selection, "_card_ids", card_selection.OrderedDict())
+    monkeypatch.setattr(card_selection, "_cached_ids", 0)
+    monkeypatch.setattr(card_selection, "_last_sweep", 0.0)
+    monkeypatch.setattr(card_selection, "MAX_CACHED_IDS", 12)
+
+    for other in range(100, 104):
+        card_selection.get_card_ids(other)  # empty subjects
+    assert list(card_selection.get_card_ids(subject_id)) == card_ids
+    with card_selection._lock:
+        card_selection._store(200, (0.0, card_selection.array('q', range(10)), None), 0.0)
+    assert subject_id not in card_selection._card_ids and card_selection._cached_ids == 10
+
+    # An insert after the TTL sweeps out everything that has expired
+    now = card_selection.time.monotonic() + card_selection.CARD_ID_TTL + 1
+    monkeypatch.setattr(card_selection.time, "monotonic", lambda: now)
+    card_selection.get_card_ids(subject_id)
+    assert list(card_selection._card_ids) == [subject_id]
+    assert card_selection._cached_ids == len(card_ids)
@@ -0,0 +1,41 @@
+import threading
+
+from sqlalchemy import create_engine, event
+
+import db_pool
+
+
+def make_engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=db_pool.InstrumentedQueuePool,
+                         pool_size=3, max_overflow=0)
+
+
+def run_warm_up(engine, count):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(db_pool.warm_up(engine, count, timeout=5)),
+                              daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive(), "warm-up hung"
+    return result[0]
+
+
+def test_warm_up_opens_the_requested_connections(tmp_path):
+    engine = make_engine(tmp_path)
+    assert run_warm_up(engine, 5) == 3
+    assert engine.pool.checkedin() == 3
+
+
+def test_warm_up_survives_a_failed_connect(tmp_path, caplog):
+    engine = make_engine(tmp_path)
+    attempts = []
+
+    @event.listens_for(engine, "do_connect")
+    def fail_once(dialect, conn_rec, cargs, cparams):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("connection refused")
+
+    opened = run_warm_up(engine, 3)
+    assert opened == engine.pool.checkedin() < 3
+    assert "Failed to open a connection" in caplog.text
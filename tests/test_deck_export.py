@@ -0,0 +1,24 @@
+import deletion
+from models import db, Subject
+
+
+def test_etag_changes_when_a_deleted_subjects_id_is_reused(app, deck):
+    _, subject_id, _ = deck
+    subject = db.session.get(Subject, subject_id)
+    subject.is_public = True
+    owner_id = subject.user_id
+    db.session.commit()
+    client = app.test_client()
+    etag = client.get(f"/subject/{subject_id}/export.csv").headers["ETag"]
+    assert client.get(f"/subject/{subject_id}/export.csv",
+                      headers={"If-None-Match": etag}).status_code == 304
+
+    assert deletion.delete_subject(subject_id) is None
+    replacement = Subject(name="Rivers", user_id=owner_id, is_public=True)
+    db.session.add(replacement)
+    db.session.commit()
+    assert (replacement.id, replacement.version) == (subject_id, 0)
+
+    response = client.get(f"/subject/{subject_id}/export.csv", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,43 @@
+import time
+
+import card_selection
+import deletion
+from models import db, Flashcard, Subject
+
+
+def test_deleting_a_user_bumps_subjects_they_added_cards_to(deck):
+    student_id, subject_id, card_ids = deck
+    db.session.add(Flashcard(question="extra", answer="card", user_id=student_id, subject_id=subject_id))
+    db.session.commit()
+    version = db.session.get(Subject, subject_id).version
+    assert card_selection.card_count(subject_id) == len(card_ids) + 1
+
+    assert deletion.delete_user(student_id) is None
+
+    db.session.expire_all()
+    assert db.session.get(Subject, subject_id).version == version + 1
+    assert card_selection.card_count(subject_id) == len(card_ids)
+    assert Flashcard.query.filter_by(subject_id=subject_id).count() == len(card_ids)
+
+
+def test_failed_background_deletion_bumps_the_subject_version(app, deck, monkeypatch):
+    _, subject_id, card_ids = deck
+    version = db.session.get(Subject, subject_id).version
+    monkeypatch.setattr(deletion, "BACKGROUND_THRESHOLD", 1)
+    monkeypatch.setattr(deletion, "CHUNK_SIZE", 2)
+
+    def fail(subject_ids):
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(deletion, "_delete_subject_rows", fail)
+
+    job = deletion.delete_subject(subject_id)
+    for _ in range(500):
+        if job.status != "running":
+            break
+        time.sleep(0.01)
+
+    assert job.status == "failed"
+    assert job.done == len(card_ids)
+    db.session.expire_all()
+    assert db.session.get(Subject, subject_id).version > version
+    assert card_selection.card_count(subject_id, db.session.get(Subject, subject_id).version) == 0
@@ -0,0 +1,44 @@
+import io
+
+import pytest
+
+import enrollment
+from models import db, User, Classroom, ClassMembership
+
+
+@pytest.fixture
+def classroom(deck):
+    teacher = User.query.filter_by(username="teacher").one()
+    classroom = Classroom(name="Geography", teacher_id=teacher.id)
+    db.session.add(classroom)
+    db.session.commit()
+    return classroom.id
+
+
+def test_enroll_matches_emails_case_insensitively(deck, classroom):
+    student_id, _, _ = deck
+    result = enrollment.enroll(classroom, ["Student@Example.com", "student@example.com", "nobody@example.com"])
+
+    assert result.enrolled == ["Student@Example.com"]
+    assert result.duplicates == ["student@example.com"]
+    assert result.missing == ["nobody@example.com"]
+    assert ClassMembership.query.filter_by(classroom_id=classroom, user_id=student_id).count() == 1
+
+
+def test_enroll_api_rejects_non_object_bodies(app, classroom):
+    client = app.test_client()
+    client.post("/login", data={"username": "teacher", "password": "secret"})
+    assert client.post(f"/api/class/{classroom}/enroll", json=["student@example.com"]).status_code == 400
+    assert client.post(f"/api/class/{classroom}/enroll", json={"emails": ["student@example.com"]}).status_code == 200
+
+
+def test_unreadable_roster_is_reported(app, classroom):
+    client = app.test_client()
+    client.post("/login", data={"username": "teacher", "password": "secret"})
+    roster = b'email\nstudent@example.com\n"' + b"x" * 200_000 + b'"\n'
+    response = client.post(f"/class/{classroom}/roster", data={"file": (io.BytesIO(roster), "roster.csv")},
+                           follow_redirects=True)
+
+    assert response.status_code == 200
+    assert b"Could not read line" in response.data
+    assert ClassMembership.query.filter_by(classroom_id=classroom).count() == 0
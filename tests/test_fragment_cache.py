@@ -0,0 +1,38 @@
+import os
+
+import fragment_cache
+
+
+def test_lru_evicts_oldest_entries_over_the_byte_cap():
+    cache = fragment_cache.FragmentCache(max_bytes=10)
+    cache.set(("cards", 1, 0, "teacher"), "aaaaa")
+    cache.set(("cards", 2, 0, "teacher"), "bbbbb")
+    assert cache.get(("cards", 1, 0, "teacher")) == "aaaaa"
+    cache.set(("cards", 3, 0, "teacher"), "ccccc")
+
+    assert cache.get(("cards", 2, 0, "teacher")) is None
+    assert cache.get(("cards", 1, 0, "teacher")) == "aaaaa"
+    stats = cache.snapshot()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["bytes"]) == (2, 1, 1, 10)
+
+
+def test_file_store_removes_superseded_versions(tmp_path):
+    store = fragment_cache.FileStore(str(tmp_path))
+    store.set(("cards", 1, 1, "teacher"), "v1")
+    store.set(("cards", 11, 1, "teacher"), "other subject")
+    store.set(("cards", 1, 2, "admin"), "v2")
+
+    assert sorted(os.listdir(tmp_path)) == ["1-2-cards-admin.html", "11-1-cards-teacher.html"]
+    store.delete_subject(1)
+    assert os.listdir(tmp_path) == ["11-1-cards-teacher.html"]
+
+
+def test_subject_page_shows_new_cards(app, deck):
+    _, subject_id, card_ids = deck
+    client = app.test_client()
+    client.post("/login", data={"username": "teacher", "password": "secret"})
+    assert f"{len(card_ids)} cards" in client.get(f"/subject/{subject_id}").get_data(as_text=True)
+
+    client.post("/create_card", data={"question": "new", "answer": "card", "subject_id": subject_id})
+    page = client.get(f"/subject/{subject_id}").get_data(as_text=True)
+    assert f"{len(card_ids) + 1} cards" in page and "<td>new</td>" in page
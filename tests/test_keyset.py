@@ -0,0 +1,27 @@
+import pytest
+
+import keyset
+from models import db, User
+
+
+@pytest.mark.parametrize("values", [[{"a": 1}], [[1]], [None], [True], ["1"], [2**70], [1, 2]])
+def test_tampered_cursors_are_rejected(values):
+    assert keyset.decode_cursor(keyset.encode_cursor(values), [int]) is None
+
+
+def test_cursor_round_trip():
+    cursor = keyset.encode_cursor(["alice", 7])
+    assert keyset.decode_cursor(cursor, [str, int]) == ["alice", 7]
+    assert keyset.decode_cursor("not base64!", [str, int]) is None
+
+
+def test_admin_users_ignores_tampered_cursor(app, deck):
+    admin = User(username="admin", email="admin@example.com", role="admin")
+    admin.set_password("secret")
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+    client.post("/login", data={"username": "admin", "password": "secret"})
+    for values in ([{"a": 1}], [[1]], [None]):
+        response = client.get("/admin/users", query_string={"after": keyset.encode_cursor(values)})
+        assert response.status_code == 200
@@ -0,0 +1,21 @@
+import os
+import signal
+
+import passwords
+
+
+def test_pool_is_replaced_after_its_process_dies(monkeypatch):
+    monkeypatch.setenv("PASSWORD_HASH_WORKERS", "1")
+    monkeypatch.setenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+    passwords.shutdown()
+    try:
+        stored = passwords.hash_password("secret")
+        broken = passwords._executor
+        for pid in list(broken._processes):
+            os.kill(pid, signal.SIGKILL)
+
+        assert passwords.verify_password(stored, "secret")
+        assert not passwords.verify_password(stored, "wrong")
+        assert passwords._executor is not broken
+    finally:
+        passwords.shutdown()
@@ -0,0 +1,40 @@
+import app as app_module
+import review_log
+from models import db, ReviewEvent, Subject, SubjectProgress
+
+
+def test_each_app_writes_its_own_events(app, tmp_path):
+    other = app_module.create_app({"TESTING": True, "PRECOMPILE_TEMPLATES": False,
+                                   "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'other.db'}"})
+    with other.app_context():
+        db.create_all()
+        review_log.record(1, 1, 1, "show")
+        review_log.record(1, 1, 2, "show")
+    review_log.record(1, 1, 3, "next")
+
+    assert app.extensions["review_log"] is not other.extensions["review_log"]
+    other.extensions["review_log"].flush()
+    app.extensions["review_log"].flush()
+
+    assert [event.card_id for event in ReviewEvent.query] == [3]
+    with other.app_context():
+        assert sorted(event.card_id for event in ReviewEvent.query) == [1, 2]
+        db.engine.dispose()
+
+
+def test_events_of_deleted_subjects_do_not_lose_the_batch(app, deck):
+    student_id, subject_id, card_ids = deck
+    db.session.execute(db.text("PRAGMA foreign_keys=ON"))
+    teacher_id = db.session.get(Subject, subject_id).user_id
+    gone = Subject(name="Gone", user_id=teacher_id)
+    db.session.add(gone)
+    db.session.commit()
+    review_log.record(student_id, gone.id, 1, "grade", "good")
+    review_log.record(student_id, subject_id, card_ids[0], "grade", "good")
+    db.session.delete(gone)
+    db.session.commit()
+
+    app.extensions["review_log"].flush()
+
+    assert ReviewEvent.query.count() == 2
+    assert [(row.subject_id, row.reviews) for row in SubjectProgress.query] == [(subject_id, 1)]
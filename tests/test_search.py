@@ -0,0 +1,77 @@
+import io
+
+import pytest
+
+import card_import
+import deletion
+import search
+from models import db, User, Subject, Flashcard
+
+
+@pytest.fixture
+def teacher(migrated_app):
+    user = User(username="teacher", email="teacher@example.com", role="teacher")
+    user.set_password("secret")
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def add_subject(teacher, name, cards=(), is_public=True):
+    subject = Subject(name=name, user_id=teacher, is_public=is_public)
+    db.session.add(subject)
+    db.session.flush()
+    db.session.add_all([Flashcard(question=q, answer=a, user_id=teacher, subject_id=subject.id)
+                        for q, a in cards])
+    db.session.commit()
+    return subject.id
+
+
+def hit_ids(terms, **kwargs):
+    hits, _ = search.search_subjects(terms, **kwargs)
+    return [subject_id for subject_id, _, _ in hits]
+
+
+def test_name_matches_rank_above_card_matches(teacher):
+    for n in range(8):
+        add_subject(teacher, f"Filler {n}", [(f"Question {n}?", f"Answer {n}")])
+    by_card = add_subject(teacher, "Geography", [("Capital of France?", "Paris"), ("Longest river?", "Nile")])
+    by_name = add_subject(teacher, "Capitals", [("France?", "Paris"), ("Spain?", "Madrid")])
+    add_subject(teacher, "Hidden", [("Capital of Italy?", "Rome")], is_public=False)
+
+    assert hit_ids("capital") == [by_name, by_card]
+    assert hit_ids("capit") == [by_name, by_card]
+    assert hit_ids("volcano") == []
+
+
+def test_cursor_pages_do_not_overlap(migrated_app, teacher):
+    subject_ids = [add_subject(teacher, f"Deck {n}", [("Capital of Peru?", "Lima")]) for n in range(7)]
+
+    seen, cursor = [], None
+    while True:
+        hits, cursor = search.search_subjects("lima", after=cursor, limit=3)
+        seen.extend(subject_id for subject_id, _, _ in hits)
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(subject_ids)
+    assert len(seen) == len(set(seen))
+
+    page = migrated_app.test_client().get("/search", query_string={"q": "lima", "after": "garbage"})
+    assert page.status_code == 200
+
+
+def test_index_follows_imported_and_deleted_cards(teacher):
+    subject_id = add_subject(teacher, "Chemistry")
+    rows = "question,answer\n" + "".join(f"Symbol of element {n}?,xenon{n}\n" for n in range(50))
+    result = card_import.import_cards(io.StringIO(rows), subject_id, teacher, batch_size=20)
+    assert result.imported == 50
+
+    assert hit_ids("xenon7") == [subject_id]
+    db.session.execute(db.delete(Flashcard).where(Flashcard.answer == "xenon7"))
+    db.session.commit()
+    assert hit_ids("xenon7") == []
+    assert hit_ids("xenon8") == [subject_id]
+
+    assert deletion.delete_subject(subject_id) is None
+    assert hit_ids("xenon8") == []
+    assert hit_ids("chemistry") == []
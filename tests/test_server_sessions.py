@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+import server_sessions
+from models import db, ServerSession
+
+
+class RecordingStore(server_sessions.MemoryStore):
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def set(self, sid, payload, expires_at):
+        self.writes.append(sid)
+        super().set(sid, payload, expires_at)
+
+
+@pytest.fixture
+def store(app):
+    store = RecordingStore()
+    app.session_interface = server_sessions.ServerSessionInterface(store)
+    return store
+
+
+@pytest.fixture
+def client(app, deck, store):
+    return app.test_client()
+
+
+def session_id(client):
+    cookie = client.get_cookie(client.application.config["SESSION_COOKIE_NAME"])
+    return cookie.value if cookie else None
+
+
+def login(client):
+    return client.post("/login", data={"username": "student", "password": "secret"})
+
+
+def test_unmodified_session_is_not_written(client, store):
+    login(client)
+    store.writes.clear()
+
+    response = client.get("/")
+    assert response.status_code == 200
+    assert store.writes == []
+    assert "Set-Cookie" not in response.headers
+
+
+def test_login_and_logout_issue_a_new_session_id(client, store):
+    store.set("planted", server_sessions.serializer.dumps({"next": "/"}).encode(), time.time() + 3600)
+    client.set_cookie(client.application.config["SESSION_COOKIE_NAME"], "planted")
+
+    login(client)
+    logged_in = session_id(client)
+    assert logged_in not in (None, "planted")
+    assert store.get("planted") is None
+
+    client.get("/logout")
+    assert session_id(client) != logged_in
+    assert store.get(logged_in) is None
+
+
+def test_stale_session_is_rewritten(app, client, store):
+    login(client)
+    sid = session_id(client)
+    lifetime = app.permanent_session_lifetime.total_seconds()
+    _, payload = store.get(sid)
+    store.set(sid, payload, time.time() + lifetime / 2 - 60)
+    store.writes.clear()
+
+    response = client.get("/")
+    assert store.writes == [sid]
+    assert "Set-Cookie" in response.headers
+    assert store.get(sid)[0] > time.time() + lifetime / 2
+
+
+def test_memory_store_drops_expired_sessions():
+    store = server_sessions.MemoryStore()
+    store.set("old", b"{}", time.time() - 1)
+    store.set("live", b"{}", time.time() + 60)
+
+    assert store.get("old") is None
+    assert "old" not in store._data
+    assert store.get("live") is not None
+
+
+def test_database_store_drops_expired_sessions(app):
+    store = server_sessions.DatabaseStore()
+    store.set("old", b"{}", time.time() - 1)
+    store.set("live", b"{}", time.time() + 60)
+
+    assert store.get("old") is None
+    assert db.session.get(ServerSession, "old") is None
+    expires_at, payload = store.get("live")
+    assert payload == b"{}"
+    assert abs(expires_at - (time.time() + 60)) < 5
+    assert store.purge_expired() == 0
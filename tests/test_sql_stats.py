@@ -0,0 +1,40 @@
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import app as app_module
+import sql_stats
+from models import db
+
+
+@pytest.fixture
+def stats_app():
+    app = app_module.create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite://",
+                                 "PRECOMPILE_TEMPLATES": False, "SQL_STATS_ENABLED": True})
+    sql_stats.reset()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+    sql_stats.reset()
+
+
+def test_unmatched_urls_share_one_entry(stats_app):
+    client = stats_app.test_client()
+    for n in range(5):
+        assert client.get(f"/no-such-page/{n}").status_code == 404
+    client.get("/login")
+
+    endpoints = {row["endpoint"]: row["requests"] for row in sql_stats.snapshot()}
+    assert endpoints == {sql_stats.UNMATCHED: 5, "main.login": 1}
+
+
+def test_failed_statements_do_not_leak_start_times(stats_app):
+    with stats_app.test_request_context("/"):
+        sql_stats._before_request()
+        connection = db.session.connection()
+        with pytest.raises(OperationalError):
+            connection.execute(text("SELECT * FROM no_such_table"))
+        assert connection.info.get("sql_stats_start") == []
+        g.pop("sql_stats")
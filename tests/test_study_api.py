@@ -0,0 +1,26 @@
+import pytest
+
+from models import db, Subject
+
+
+@pytest.fixture
+def client(app, deck):
+    _, subject_id, _ = deck
+    db.session.get(Subject, subject_id).is_public = True
+    db.session.commit()
+    client = app.test_client()
+    client.post("/login", data={"username": "student", "password": "secret"})
+    return client
+
+
+def test_cards_ignore_malformed_held_ids(client, deck):
+    _, subject_id, card_ids = deck
+    response = client.get(f"/api/study/{subject_id}/cards?n=2&x={card_ids[0]},²,{'9' * 30}")
+    assert response.status_code == 200
+    assert [card["i"] for card in response.get_json()["c"]] == card_ids[1:3]
+
+
+@pytest.mark.parametrize("body", [[{"i": 1, "g": "good"}], "good", 3, None])
+def test_grades_reject_non_object_bodies(client, deck, body):
+    _, subject_id, _ = deck
+    assert client.post(f"/api/study/{subject_id}/grades", json=body).status_code == 400
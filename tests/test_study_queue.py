@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+import scheduler
+import study_queue
+from models import db, Flashcard
+
+
+def test_next_walks_through_unseen_cards(deck):
+    student_id, subject_id, card_ids = deck
+    card = study_queue.next_due_card(student_id, subject_id)
+    shown = [card.id]
+    for _ in range(len(card_ids) - 1):
+        card = study_queue.next_due_card(student_id, subject_id, exclude_card_id=card.id)
+        shown.append(card.id)
+    assert shown == card_ids
+
+    # After the last unseen card it wraps around to the first
+    card = study_queue.next_due_card(student_id, subject_id, exclude_card_id=card.id)
+    assert card.id == card_ids[0]
+
+
+def test_due_cards_come_before_unseen_cards(deck):
+    student_id, subject_id, card_ids = deck
+    state = study_queue.record_grade(student_id, db.session.get(Flashcard, card_ids[3]), "good")
+    state.due_at = scheduler.utcnow() - timedelta(minutes=1)
+    db.session.commit()
+
+    assert study_queue.next_due_card(student_id, subject_id).id == card_ids[3]
+    assert study_queue.next_due_card(student_id, subject_id, exclude_card_id=card_ids[3]).id == card_ids[4]
+
+
+def test_graded_cards_leave_the_unseen_queue(deck):
+    student_id, subject_id, card_ids = deck
+    applied = study_queue.record_grades(student_id, subject_id, [(card_ids[0], "good"), (card_ids[1], "bogus")])
+    assert applied == [(card_ids[0], "good")]
+    assert study_queue.next_due_card(student_id, subject_id).id == card_ids[1]
+    assert [card.id for card in study_queue.next_due_cards(student_id, subject_id, 3)] == card_ids[1:4]
+
+
+def test_next_state_schedules_passing_grades_further_out():
+    ease, interval, repetitions, lapses = scheduler.next_state(2.5, 0, 0, 0, "good")
+    assert repetitions == 1 and lapses == 0 and interval > 0
+    _, longer, _, _ = scheduler.next_state(ease, interval, repetitions, lapses, "good")
+    assert longer > interval
+    _, reset, _, lapsed = scheduler.next_state(ease, longer, 2, 0, "again")
+    assert reset < longer and lapsed == 1